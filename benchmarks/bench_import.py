@@ -0,0 +1,79 @@
+"""
+Measures how long importing td takes, which every td command pays before doing anything.
+Exits with 1 if it takes longer than the budget or if one of the modules that should only
+be imported by the commands that use them is imported at startup.
+Run from the root of the repository with: python -m benchmarks.bench_import [budget in milliseconds]
+"""
+import subprocess
+import sys
+import os
+
+ENTRY_POINT = 'td.td'
+
+# In milliseconds, as reported by -X importtime which adds some overhead of its own
+BUDGET = 300
+REPEATS = 5
+
+# Only imported inside the commands that need them
+LAZY_MODULES = ['inquirer', 'rich.markdown', 'rich.progress', 'sqlite3', 'td.utils.jsonutils', 'td.utils.importer', 'json', 'csv']
+
+# How many of the slowest modules to list
+TOP = 10
+
+def import_times() -> dict:
+    """
+    Imports the entry point in a new interpreter and returns the cumulative
+    import time in milliseconds of every module that was imported
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {ENTRY_POINT}'],
+        capture_output=True, text=True, env=env, check=True
+    )
+
+    times = {}
+
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('imported package'):
+            continue
+
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1000
+
+    return times
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET
+
+    # The fastest run is the one least disturbed by everything else on the machine
+    runs = [import_times() for _ in range(REPEATS)]
+    best = min(runs, key=lambda times: times[ENTRY_POINT])
+
+    print(f"Slowest modules imported by {ENTRY_POINT}:")
+
+    for name, elapsed in sorted(best.items(), key=lambda item: item[1], reverse=True)[:TOP]:
+        print(f"{elapsed:>10.1f} ms  {name}")
+
+    print()
+
+    failed = False
+    total = best[ENTRY_POINT]
+
+    print(f"import {ENTRY_POINT}: {total:.1f} ms (budget {budget:.0f} ms)")
+
+    if total > budget:
+        print("Over budget!")
+        failed = True
+
+    for name in LAZY_MODULES:
+        if name in best:
+            print(f"{name} is imported at startup")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Compares the memory used by the old dict-backed models with the slotted ones.
+Run from the root of the repository with: python -m benchmarks.bench_memory
+"""
+from td.utils.tasks import Task
+from td.utils.lists import List
+from td.utils.workspaces import Workspace
+import tracemalloc
+import gc
+
+SIZES = [100_000, 1_000_000]
+TASKS_PER_LIST = 100
+CHECKLIST_ITEMS = 2
+
+class LegacyTask:
+    """
+    Task as it used to be: a __dict__ per object, the status as the last
+    character of the name and checklist items as strings ending in '0' or '1'
+    """
+
+    def __init__(self, name: str, task_id: int, importance: int = 1, description: str = "") -> None:
+        self.name = name
+        self.id = int(task_id)
+        self.importance = int(importance)
+        self.description = description
+        self.checklist = []
+
+    def add_item(self, item_name: str) -> None:
+        self.checklist.append(item_name)
+
+class LegacyList:
+
+    def __init__(self, list_id: int, name: str):
+        self.id = int(list_id)
+        self.name = name
+        self.task_ids = []
+
+class LegacyWorkspace:
+
+    def __init__(self, name, workspace_id):
+        self.name = name
+        self.id = int(workspace_id)
+        self.list_ids = []
+
+def build_legacy(num_tasks: int) -> list:
+    ws = LegacyWorkspace('Benchmark', 1)
+    objects = [ws]
+    ls = None
+
+    for i in range(num_tasks):
+        task_id = i + 2
+
+        if i % TASKS_PER_LIST == 0:
+            ls = LegacyList(num_tasks + 2 + i // TASKS_PER_LIST, f"List {i}")
+            ws.list_ids.append(ls.id)
+            objects.append(ls)
+
+        task = LegacyTask(f"Task {task_id}" + str(i % 2), task_id, i % 3 + 1, f"Description {task_id}")
+
+        for item in range(CHECKLIST_ITEMS):
+            task.add_item(f"Item {item}" + str(item % 2))
+
+        ls.task_ids.append(task.id)
+        objects.append(task)
+
+    return objects
+
+def build_slotted(num_tasks: int) -> list:
+    ws = Workspace('Benchmark', 1)
+    objects = [ws]
+    ls = None
+
+    for i in range(num_tasks):
+        task_id = i + 2
+
+        if i % TASKS_PER_LIST == 0:
+            ls = List(num_tasks + 2 + i // TASKS_PER_LIST, f"List {i}")
+            ws.list_ids.append(ls.id)
+            objects.append(ls)
+
+        task = Task(f"Task {task_id}", task_id, i % 3 + 1, f"Description {task_id}", completed=i % 2)
+
+        for item in range(CHECKLIST_ITEMS):
+            task.add_item(f"Item {item}", done=item % 2)
+
+        ls.task_ids.append(task.id)
+        objects.append(task)
+
+    return objects
+
+def measure(build, num_tasks: int) -> int:
+    """
+    Returns the bytes still allocated after building num_tasks tasks
+    """
+    gc.collect()
+    tracemalloc.start()
+
+    objects = build(num_tasks)
+    size, _ = tracemalloc.get_traced_memory()
+
+    tracemalloc.stop()
+    del objects
+
+    return size
+
+def main():
+    print(f"{'tasks':>10}{'legacy MB':>12}{'slotted MB':>12}{'saved':>8}{'bytes/task':>12}")
+
+    for size in SIZES:
+        legacy = measure(build_legacy, size)
+        slotted = measure(build_slotted, size)
+
+        saved = 1 - slotted / legacy
+        print(f"{size:>10}{legacy / 2**20:>12.1f}{slotted / 2**20:>12.1f}{saved:>8.0%}{slotted / size:>12.0f}")
+
+if __name__ == "__main__":
+    main()
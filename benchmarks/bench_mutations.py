@@ -0,0 +1,84 @@
+"""
+Measures how long single changes take as the store grows, including writing them.
+Every operation runs in a transaction of its own like a td command does, so it's timed
+with its commit: td.txt (and its cache) being rewritten in text mode, or a record being
+appended to td.txt.journal in journal mode, with the compactions that happen now and then.
+find and parent only read, so nothing is written for them.
+Run from the root of the repository with: python -m benchmarks.bench_mutations
+"""
+from benchmarks.generate import generate_store
+from td.utils.fileutils import Fileutils
+from td.utils.tasks import Task
+import tempfile
+import time
+
+SIZES = [100, 1_000, 10_000, 100_000]
+
+# Text mode rewrites all of td.txt on every commit, so it gets fewer repeats
+REPEATS = {'text': 10, 'journal': 200}
+
+def time_per_op(fileutils: Fileutils, operation, repeats: int) -> float:
+    """
+    Returns the average time of operation and its commit in microseconds
+    """
+    task_ids = fileutils.get_task_ids()
+    step = max(1, len(task_ids) // repeats)
+    targets = [task_ids[i * step % len(task_ids)] for i in range(repeats)]
+
+    start = time.perf_counter()
+
+    for task_id in targets:
+        with fileutils.transaction():
+            operation(fileutils, task_id)
+
+    return (time.perf_counter() - start) / repeats * 1_000_000
+
+def move_task(fileutils: Fileutils, task_id: int) -> None:
+    """
+    What td move does to a task, moved to the end of the list it's in
+    """
+    fileutils.move_tasks([task_id], fileutils.store.get_parent_list(task_id).id)
+
+def add_task(fileutils: Fileutils, task_id: int) -> None:
+    """
+    What td add task does, the task is added to the list task_id is in
+    """
+    task = Task(name="New task", task_id=fileutils.generate_id())
+
+    fileutils.add_task_to_file(task)
+    fileutils.add_task_to_list(fileutils.store.get_parent_list(task_id).id, task.id)
+
+OPERATIONS = {
+    'done': lambda fileutils, task_id: fileutils.mark_task_as_done(task_id),
+    'rename': lambda fileutils, task_id: fileutils.edit_task('name', task_id, 'Renamed'),
+    'importance': lambda fileutils, task_id: fileutils.edit_task('importance', task_id, '3'),
+    'checklist': lambda fileutils, task_id: fileutils.mark_checklist_item_as_done(task_id, 'Item 0'),
+    'move': move_task,
+    'add': add_task,
+    'find': lambda fileutils, task_id: fileutils.find_object(task_id),
+    'parent': lambda fileutils, task_id: fileutils.store.get_parent_list(task_id),
+}
+
+def main():
+    header = f"{'tasks':>8}{'mode':>9}" + ''.join(f"{name:>12}" for name in OPERATIONS)
+    print(header + "    (microseconds per operation)")
+
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as directory:
+            generate_store(directory, size)
+
+            for mode, repeats in REPEATS.items():
+                row = f"{size:>8}{mode:>9}"
+
+                for operation in OPERATIONS.values():
+                    fileutils = Fileutils(f"{directory}/td.txt", f"{directory}/config.txt", journal=mode == 'journal')
+
+                    # Loading isn't part of the operation
+                    fileutils.store
+
+                    row += f"{time_per_op(fileutils, operation, repeats):>12.2f}"
+
+                print(row)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Measures how long td show takes in workspaces with many lists, with the progress bar printed
+under every list drawn by a live rich Progress like it used to be and by the static renderable.
+Run from the root of the repository with: python -m benchmarks.bench_show
+"""
+from benchmarks.generate import generate_store
+from rich.progress import Progress, TextColumn, BarColumn, MofNCompleteColumn
+from rich.align import Align
+from contextlib import redirect_stdout
+import tempfile
+import time
+import os
+
+NUM_LISTS = [10, 100, 500]
+TASKS_PER_LIST = 5
+REPEATS = 3
+
+class LegacyCenteredProgress(Progress):
+    """
+    The progress bar as it used to be printed: a live display that was started and stopped for every bar
+    """
+    def get_renderable(self):
+        return Align.center(super().get_renderable())
+
+def legacy_print_progress_bar(total: int, num_completed: int) -> None:
+    with LegacyCenteredProgress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn()
+    ) as progress:
+        progress.add_task(description="[italic #96FF4B]Progress[/italic #96FF4B]", total=total, completed=num_completed)
+
+def time_show(show) -> float:
+    """
+    Returns the best time in milliseconds of running td show in the current directory
+    """
+    best = None
+
+    with open(os.devnull, mode='w') as devnull, redirect_stdout(devnull):
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            show()
+            elapsed = (time.perf_counter() - start) * 1000
+
+            if best is None or elapsed < best:
+                best = elapsed
+
+    return best
+
+def main():
+    from td.utils import apputils
+    from td.td import show
+
+    static_print_progress_bar = apputils.print_progress_bar
+
+    print(f"{'lists':>8}{'live':>12}{'static':>12}    (milliseconds per show)")
+
+    cwd = os.getcwd()
+
+    for num_lists in NUM_LISTS:
+        with tempfile.TemporaryDirectory() as directory:
+            generate_store(directory, num_lists * TASKS_PER_LIST, tasks_per_list=TASKS_PER_LIST)
+
+            # td works on the td.txt in the current directory
+            os.chdir(directory)
+
+            try:
+                apputils.fileutils.refresh()
+
+                apputils.print_progress_bar = legacy_print_progress_bar
+                live = time_show(show)
+
+                apputils.print_progress_bar = static_print_progress_bar
+                static = time_show(show)
+
+            finally:
+                os.chdir(cwd)
+
+            print(f"{num_lists:>8}{live:>12.1f}{static:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Measures how long loading the store takes with and without the parse cache.
+Run from the root of the repository with: python -m benchmarks.bench_startup
+"""
+from benchmarks.generate import generate_store
+from td.utils.fileutils import Fileutils
+import tempfile
+import time
+import os
+
+SIZES = [1_000, 10_000, 50_000]
+REPEATS = 5
+
+def time_load(directory: str, use_cache: bool) -> float:
+    """
+    Returns the best time in milliseconds of loading the store with a new Fileutils,
+    which is what every td command does first.
+    Without the cache this includes writing it again, like the first command after td.txt changed
+    """
+    cache_path = os.path.join(directory, 'td.txt.cache')
+    best = None
+
+    for _ in range(REPEATS):
+        fileutils = Fileutils(os.path.join(directory, 'td.txt'), os.path.join(directory, 'config.txt'))
+
+        if not use_cache and os.path.exists(cache_path):
+            os.remove(cache_path)
+
+        start = time.perf_counter()
+        fileutils.check_format()
+        fileutils.store
+        elapsed = (time.perf_counter() - start) * 1000
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+def main():
+    print(f"{'tasks':>8}{'parse':>12}{'cache':>12}    (milliseconds to load)")
+
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as directory:
+            generate_store(directory, size)
+
+            # The cache is checked against the mtime of td.txt, make it old enough to be trusted
+            os.utime(os.path.join(directory, 'td.txt'), ns=(0, 0))
+
+            parse = time_load(directory, use_cache=False)
+
+            # Written by the last load
+            Fileutils(os.path.join(directory, 'td.txt'), os.path.join(directory, 'config.txt')).store
+            cache = time_load(directory, use_cache=True)
+
+            print(f"{size:>8}{parse:>12.1f}{cache:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Builds synthetic td.txt files for the benchmarks
+"""
+from td.utils.tasks import Task
+from td.utils.lists import List
+from td.utils.workspaces import Workspace
+from td.utils.fileutils import Fileutils
+import os
+
+def generate_store(directory: str, num_tasks: int, tasks_per_list: int = 100, checklist_items: int = 2) -> Fileutils:
+    """
+    Writes a td.txt with one workspace holding num_tasks tasks spread over lists of
+    tasks_per_list tasks and returns a Fileutils for it
+    """
+    fileutils = Fileutils(os.path.join(directory, 'td.txt'), os.path.join(directory, 'config.txt'))
+    fileutils.check_existance()
+
+    next_id = 1
+
+    with fileutils.transaction():
+        ws = Workspace(name='Benchmark', workspace_id=next_id)
+        fileutils.add_workspace_to_file(ws)
+        fileutils.set_current_workspace(ws.id)
+        next_id += 1
+
+        ls = None
+
+        for i in range(num_tasks):
+            if i % tasks_per_list == 0:
+                ls = List(list_id=next_id, name=f"List {next_id}")
+                fileutils.add_list_to_file(ls)
+                fileutils.add_list_to_workspace(ws.id, ls.id)
+                next_id += 1
+
+            task = Task(name=f"Task {next_id}", task_id=next_id, importance=i % 3 + 1, description=f"Description {next_id}", completed=i % 2)
+
+            for item in range(checklist_items):
+                task.add_item(f"Item {item}", done=item % 2)
+
+            fileutils.add_task_to_file(task)
+            fileutils.add_task_to_list(ls.id, task.id)
+            next_id += 1
+
+    return fileutils
@@ -0,0 +1,91 @@
+"""
+td batch.
+Runs td commands written one per line the same way they're typed after td
+(add task "Buy milk", done 5, del 7 -r 2, move 3 -l 2) against the store loaded once.
+Every rank is resolved against the ranks from when the batch started and td.txt is written
+once at the end, or after every N commands with a checkpoint
+"""
+from itertools import islice
+import shlex
+import sys
+import io
+import typer
+import typer.main
+from td.utils import apputils
+
+# These can't run inside a batch
+EXCLUDED_COMMANDS = ['batch', 'serve', 'config', 'migrate']
+
+def read_commands(lines):
+    """
+    Yields the line number and the arguments of every command.
+    Blank lines and lines starting with # are skipped and a leading td is dropped
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if line.lstrip().startswith('#'):
+            continue
+
+        try:
+            args = shlex.split(line)
+        except ValueError as e:
+            raise typer.BadParameter(f"Line {line_number}: {e}")
+
+        if args[:1] == ['td']:
+            args = args[1:]
+
+        if args == []:
+            continue
+
+        if args[0] in EXCLUDED_COMMANDS:
+            raise typer.BadParameter(f"Line {line_number}: td {args[0]} can't be run in a batch")
+
+        yield line_number, args
+
+def run_command(command, line_number: int, args: list) -> None:
+    """
+    Errors are printed by typer just like when the command is run on its own
+    """
+    # Nothing can be asked while a batch runs, td del on a workspace aborts instead
+    real_stdin = sys.stdin
+    sys.stdin = io.StringIO()
+
+    try:
+        command.main(args=['--quiet', *args], prog_name='td', standalone_mode=True)
+        exit_code = 0
+
+    except SystemExit as e:
+        exit_code = e.code
+
+    finally:
+        sys.stdin = real_stdin
+
+    if exit_code not in [0, None]:
+        raise typer.BadParameter(f"Line {line_number}: td {shlex.join(args)} failed")
+
+def run_batch(app: typer.Typer, lines, fileutils, checkpoint: int = 0) -> int:
+    """
+    Returns the number of commands that were run.
+    If a command fails nothing changed since the last checkpoint is written
+    """
+    command = typer.main.get_command(app)
+    commands = read_commands(lines)
+    num_run = 0
+    real_quiet = apputils.QUIET
+
+    try:
+        with apputils.frozen_ranks():
+            while True:
+                num_in_checkpoint = 0
+
+                with fileutils.transaction():
+                    for line_number, args in islice(commands, checkpoint or None):
+                        run_command(command, line_number, args)
+                        num_in_checkpoint += 1
+
+                num_run += num_in_checkpoint
+
+                if checkpoint == 0 or num_in_checkpoint < checkpoint:
+                    return num_run
+
+    finally:
+        apputils.QUIET = real_quiet
@@ -0,0 +1,107 @@
+"""
+The td command.
+If td serve is running in the current directory the command is sent to it over
+a Unix socket, otherwise it is run in this process just like td.td:app would.
+Only the standard library is imported until that's decided so that talking to
+the daemon doesn't pay for importing typer and rich
+"""
+import shutil
+import socket
+import json
+import sys
+import os
+
+SOCKET_PATH = os.environ.get('TD_SOCKET', 'td.sock')
+
+# These need a terminal of their own so they always run in this process
+LOCAL_COMMANDS = ['serve', 'config', 'migrate']
+
+# Environment variables that change how a command runs or how its output looks
+FORWARDED_ENV = ['TD_JOURNAL', 'TD_BACKEND', 'TD_QUIET', 'TERM', 'COLORTERM', 'NO_COLOR', 'FORCE_COLOR']
+
+def send_message(sock: socket.socket, message: dict) -> None:
+    """
+    Every message is one line of JSON
+    """
+    sock.sendall(json.dumps(message).encode() + b'\n')
+
+def receive_message(sock: socket.socket) -> dict:
+    with sock.makefile('rb') as f:
+        line = f.readline()
+
+    if not line.endswith(b'\n'):
+        raise ConnectionError("td serve closed the connection")
+
+    return json.loads(line)
+
+def command_name(argv: list) -> str:
+    """
+    Returns the name of the command, skipping options like --quiet that come before it.
+    The options td takes before the command are all flags, so none of them has a value
+    """
+    for arg in argv:
+        if not arg.startswith('-'):
+            return arg
+
+    return None
+
+def run_locally(argv: list) -> None:
+    from td.td import app
+
+    app(args=argv, prog_name='td')
+
+def connect() -> socket.socket:
+    """
+    Returns None if td serve isn't running
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        sock.connect(SOCKET_PATH)
+    except OSError:
+        sock.close()
+        return None
+
+    return sock
+
+def main() -> None:
+    argv = sys.argv[1:]
+
+    # show --pager needs the terminal to page in
+    if command_name(argv) in LOCAL_COMMANDS or '--pager' in argv:
+        run_locally(argv)
+        return
+
+    sock = connect()
+
+    if sock is None:
+        run_locally(argv)
+        return
+
+    columns, lines = shutil.get_terminal_size()
+
+    request = {
+        'argv': argv,
+        'columns': columns,
+        'lines': lines,
+        'terminal': sys.stdout.isatty(),
+        'env': {name: os.environ[name] for name in FORWARDED_ENV if name in os.environ},
+    }
+
+    # Once the command has been sent it may have run already, so it is never run again here
+    # unless the daemon says it couldn't run it
+    with sock:
+        send_message(sock, request)
+        response = receive_message(sock)
+
+    if response.get('fallback'):
+        run_locally(argv)
+        return
+
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+
+    sys.exit(response['exit_code'])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+td serve.
+Keeps td loaded in one process, with the store, rank maps and config already in memory,
+and runs the commands td.client sends it over a Unix socket one at a time
+"""
+import socketserver
+import traceback
+import socket
+import signal
+import sys
+import io
+import os
+import rich
+import typer
+import typer.main
+import typer.rich_utils
+from rich.console import Console
+from td.utils import apputils
+from td.client import SOCKET_PATH, send_message, receive_message
+
+class NeedsTerminal(Exception):
+    """
+    Raised when a command asks the user something. The client runs those itself
+    """
+
+class NoTerminal(io.TextIOBase):
+    """
+    Stands in for stdin while a command runs in the daemon
+    """
+
+    def read(self, size=-1):
+        raise NeedsTerminal()
+
+    def readline(self, size=-1):
+        raise NeedsTerminal()
+
+    def fileno(self):
+        raise NeedsTerminal()
+
+    def isatty(self):
+        return False
+
+def _same_mode(env: dict) -> bool:
+    """
+    The storage mode is picked when apputils is imported, so commands for another one can't run here
+    """
+    return env.get('TD_JOURNAL', '0') == os.environ.get('TD_JOURNAL', '0') and \
+        env.get('TD_BACKEND', 'text') == os.environ.get('TD_BACKEND', 'text')
+
+class CommandServer(socketserver.UnixStreamServer):
+
+    def __init__(self, path: str, command):
+        self.command = command
+        super().__init__(path, CommandHandler)
+
+    def run_command(self, request: dict) -> dict:
+        if not _same_mode(request['env']):
+            return {'fallback': True}
+
+        # Pick up changes made by td commands that didn't go through the daemon
+        apputils.fileutils.refresh()
+
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+
+        for name in ['TD_QUIET', 'TERM', 'COLORTERM', 'NO_COLOR', 'FORCE_COLOR']:
+            if name in request['env']:
+                os.environ[name] = request['env'][name]
+            else:
+                os.environ.pop(name, None)
+
+        os.environ['COLUMNS'] = str(request['columns'])
+        os.environ['LINES'] = str(request['lines'])
+
+        # Every console td prints with writes to the client's output instead
+        console_options = {'width': request['columns'], 'height': request['lines'], 'force_terminal': request['terminal']}
+
+        rich.reconfigure(file=stdout, **console_options)
+        apputils.console = Console(file=stdout, **console_options)
+        typer.rich_utils.FORCE_TERMINAL = request['terminal']
+
+        real_streams = sys.stdin, sys.stdout, sys.stderr
+        sys.stdin, sys.stdout, sys.stderr = NoTerminal(), stdout, stderr
+
+        try:
+            exit_code = self.command.main(args=request['argv'], prog_name='td', standalone_mode=True)
+
+        except SystemExit as e:
+            if e.code is None:
+                exit_code = 0
+            elif isinstance(e.code, int):
+                exit_code = e.code
+            else:
+                stderr.write(f"{e.code}\n")
+                exit_code = 1
+
+        except NeedsTerminal:
+            return {'fallback': True}
+
+        except Exception:
+            traceback.print_exc(file=stderr)
+            exit_code = 1
+
+        finally:
+            sys.stdin, sys.stdout, sys.stderr = real_streams
+
+        return {'exit_code': exit_code or 0, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+class CommandHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        try:
+            request = receive_message(self.request)
+        except (ConnectionError, ValueError):
+            return
+
+        send_message(self.request, self.server.run_command(request))
+
+def _is_running(path: str) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        sock.connect(path)
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+    return True
+
+def serve(app: typer.Typer, path: str = SOCKET_PATH) -> None:
+    if os.path.exists(path):
+        if _is_running(path):
+            raise typer.BadParameter(f"td serve is already running on {path}")
+
+        # Left behind by a daemon that didn't shut down cleanly
+        os.remove(path)
+
+    server = CommandServer(path, typer.main.get_command(app))
+
+    # Stop cleanly when killed as well as on ctrl-c
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    try:
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        server.server_close()
+
+        if os.path.exists(path):
+            os.remove(path)
@@ -1,16 +1,13 @@
 import typer
-import inquirer
+import sys
 from typing_extensions import Annotated
 from typing import List as typing_List
+from contextlib import nullcontext
 from rich import print as rprint
-from rich.console import Console
-from rich.table import Table
-from rich import box
 from td.utils import apputils
 from td.utils.tasks import Task
 from td.utils.lists import List
 from td.utils.workspaces import Workspace
-from td.utils.checks import Checks
 from td.utils.config import get_config, edit_config_value
 from td.utils.fileutils import Fileutils
 
@@ -18,13 +15,98 @@ from td.utils.fileutils import Fileutils
 PATH = "td.txt"  # Change this to testtd.txt when testing
 CONFIGPATH = "config.txt"  # Change this to testconfig.txt when testing
 
-checks = Checks(PATH, CONFIGPATH)
-fileutils = Fileutils(PATH, CONFIGPATH)
+# Shared with apputils so that td.txt is parsed once per command
+checks = apputils.checks
+fileutils = apputils.fileutils
 
 app = typer.Typer(rich_markup_mode='rich')
-console = Console()
+
+@app.callback()
+def main(
+    quiet: Annotated[bool, typer.Option('--quiet', '-q', envvar='TD_QUIET', help="Only print what changed instead of showing the workspace after every change")] = False
+):
+    # Set every time since td serve runs many commands in one process
+    apputils.QUIET = quiet
+
+def show_changes(*args, **kwargs):
+    """
+    Called with the arguments of show by the commands that change something once they're done.
+    In quiet mode nothing is shown, those commands only print what they changed
+    """
+    if not apputils.QUIET:
+        show(*args, **kwargs)
+
+def show_changed(shown_ids: list):
+    """
+    Shows the one task or list every change was in, or the whole workspace if they were in
+    more than one. None stands for a change that shows the whole workspace
+    """
+    if apputils.QUIET:
+        return
+
+    shown_ids = set(shown_ids)
+
+    if len(shown_ids) != 1 or None in shown_ids:
+        show_changes()
+        return
+
+    c_ws = apputils.get_workspace_from_id(fileutils.get_current_workspace_id())
+    show_changes(object_rank=apputils.get_rank_map(c_ws).get_rank(shown_ids.pop()))
+
+def mark_objects(object_ranks: list, checklist_ranks: list, done: bool):
+    """
+    Used by done and undone. Every rank is turned into an object before anything is marked
+    and all the tasks are marked in one go
+    """
+    fileutils.check_existance()
+    checks.check_file()
+
+    checks.check_if_in_main_menu()
+
+    action = 'done' if done else 'undone'
+    objs = [apputils.get_object_from_rank(object_rank) for object_rank in object_ranks]
+
+    task_ids = []
+    shown_ids = []
+
+    for obj in objs:
+        if isinstance(obj, Task):
+            if checklist_ranks == []:
+                task_ids.append(obj.id)
+                shown_ids.append(apputils.get_parent_list(obj).id)
+                continue
+
+            if 'all' in checklist_ranks:
+                item_ids = [item.id for item in obj.checklist if item.name != '']
+
+            else:
+                # Marking items changes their ranks so they're all turned into ids first
+                item_ids = []
+
+                for checklist_rank in checklist_ranks:
+                    checks.check_checklist(obj.id, checklist_rank)
+                    item_ids.append(apputils.get_checklist_item_id(checklist_rank, obj.id))
+
+            fileutils.toggle_checklist_items(obj.id, item_ids, done=done)
+
+            for item_id in item_ids:
+                apputils.print_change(action, obj, item_id=item_id)
+
+            shown_ids.append(obj.id)
+
+        elif isinstance(obj, List):
+            task_ids += obj.task_ids
+            shown_ids.append(None)
+
+    fileutils.mark_tasks(task_ids, done=done)
+
+    for task_id in task_ids:
+        apputils.print_change(action, fileutils.store.get_task(task_id))
+
+    show_changed(shown_ids)
 
 @app.command(rich_help_panel="Utilities")
+@apputils.transactional
 def add(
     typ: Annotated[str, typer.Argument(callback=checks.check_type, rich_help_panel="Task config", help="Specify the type you want to add: [bold green]workspace, list task, or task checklist[/bold green]")],
     name: Annotated[str, typer.Argument(rich_help_panel="Config", help="Specify the name/content", callback=checks.check_string_arg)],
@@ -46,7 +128,6 @@ def add(
         c_ws = apputils.get_workspace_from_id(c_ws_id)
 
         new_id = apputils.generate_id()
-        name = name + '0'
         new_task = Task(name=name, task_id=new_id, description=description, importance=importance)
         fileutils.add_task_to_file(task=new_task)
 
@@ -64,7 +145,8 @@ def add(
 
             rank = apputils.get_rank_from_task_id(new_id, c_ws)
 
-            show(object_rank=rank)
+            apputils.print_change('added', new_task, rank=rank)
+            show_changes(object_rank=rank)
             
         else:
             # If an id is provided
@@ -74,7 +156,10 @@ def add(
                 
                 fileutils.add_task_to_list(list_id=obj.id, task_id=new_id)
 
-                show(object_rank=object_rank)
+                if apputils.QUIET:
+                    apputils.print_change('added', new_task, rank=apputils.get_rank_from_task_id(new_id, c_ws))
+
+                show_changes(object_rank=object_rank)
 
             except typer.BadParameter:
                 lists = apputils.get_lists_in_workspace(c_ws)
@@ -82,7 +167,9 @@ def add(
                 fileutils.add_task_to_list(list_id=lists[0].id, task_id=new_id)
                 
                 rank = apputils.get_rank_from_task_id(new_id, c_ws)
-                show(object_rank=rank)
+
+                apputils.print_change('added', new_task, rank=rank)
+                show_changes(object_rank=rank)
             
 
     elif typ in ['checklist', 'cs']:
@@ -95,9 +182,10 @@ def add(
             obj = apputils.get_object_from_rank(object_rank)
             
             if isinstance(obj, Task):
-                fileutils.add_item(item_type='checklist', object_id=obj.id, item_name=name)
+                item_id = fileutils.add_item(item_type='checklist', object_id=obj.id, item_name=name)
                 
-                show(object_rank=object_rank)
+                apputils.print_change('added', obj, item_id=item_id)
+                show_changes(object_rank=object_rank)
             
             else:
                 raise typer.BadParameter(f"The ID '{obj.id}' doesn't belong to a task")
@@ -120,7 +208,8 @@ def add(
 
             rank = apputils.get_rank_from_list_id(new_id, c_ws)
 
-            show(object_rank=rank)
+            apputils.print_change('added', new_list, rank=rank)
+            show_changes(object_rank=rank)
 
         else:
             # TODO: get rid of this
@@ -128,6 +217,8 @@ def add(
             checks.check_workspace_id(object_rank)
             fileutils.add_list_to_workspace(workspace_id=object_rank, list_id=new_id)
 
+            apputils.print_change('added', new_list)
+
     elif typ in ['workspace', 'ws']:
         new_id = apputils.generate_id()
         new_workspace = Workspace(name, new_id)
@@ -138,9 +229,11 @@ def add(
         
         c_ws_id = fileutils.get_current_workspace_id()
         
+        apputils.print_change('added', new_workspace, rank=rank)
+
         # This is run to go to the main menu so that the new workspace can be displayed
         exit()
-        show(object_rank=rank)
+        show_changes(object_rank=rank)
 
         if c_ws_id is None:
             fileutils.set_current_workspace(0)
@@ -151,10 +244,12 @@ def add(
     fileutils.check_blank_lines()
 
 @app.command("del", rich_help_panel="Utilities")
+@apputils.transactional
 def delete(
     object_ranks: Annotated[typing_List[int], typer.Argument(help="The ID of the thing you want to delete")],
     checklist_ranks: Annotated[typing_List[int], typer.Option("--rank", "-r", help="The name of the element in the object or its rank (The number the checklist item appears in show -i (id)).")] = [],
-    delete_description: Annotated[bool, typer.Option("--description", "-d", help="Delete the description of a task.")] = False
+    delete_description: Annotated[bool, typer.Option("--description", "-d", help="Delete the description of a task.")] = False,
+    dry_run: Annotated[bool, typer.Option("--dry-run", help="Only print everything that would be deleted and how many bytes it takes up")] = False
 ):
     """
     [bold yellow]Delete a task, list or workspace[/bold yellow]
@@ -163,84 +258,101 @@ def delete(
     checks.check_file()
 
 
-    for object_rank in object_ranks:
-        obj = apputils.get_object_from_rank(object_rank)
+    if dry_run and (checklist_ranks != [] or delete_description):
+        raise typer.BadParameter("--dry-run only works when deleting tasks, lists and workspaces")
+
+    # Deleting changes the ranks so they're all turned into objects first
+    objs = [apputils.get_object_from_rank(object_rank) for object_rank in object_ranks]
 
+    # Tasks, lists and workspaces are deleted together at the end
+    roots = []
+    shown_ids = []
+
+    for obj in objs:
         if isinstance(obj, Task):
             checks.check_if_in_main_menu()
 
             if delete_description:
                 fileutils.delete_task_description(obj.id)
-                
-                c_ws_id = fileutils.get_current_workspace_id()
-                c_ws = apputils.get_workspace_from_id(c_ws_id)
-                
-                ls = apputils.get_parent_list(obj)
-
-                show(object_rank=apputils.get_rank_from_list_id(ls.id, c_ws))
 
-                continue
+                apputils.print_change('edited', obj)
+                shown_ids.append(apputils.get_parent_list(obj).id)
 
-            if checklist_ranks == []:
+            elif checklist_ranks == []:
                 # If a checklist rank isn't given
                 # This means we're deleting the task itself
-
                 checks.check_task_id(obj.id)
-                ls = apputils.get_parent_list(obj)
-                fileutils.delete_task(obj.id)
-
-                c_ws_id = fileutils.get_current_workspace_id()
-                c_ws = apputils.get_workspace_from_id(c_ws_id)
 
-                ls_rank = apputils.get_rank_from_list_id(ls.id, c_ws)
-
-                show(object_rank=ls_rank)
+                roots.append(obj)
+                shown_ids.append(apputils.get_parent_list(obj).id)
 
             else:
                 # If deleting a checklist item
+                checks.check_task_id(obj.id)
 
-                apputils.adjust_ranks(checklist_ranks)
+                # The ranks are turned into ids before anything is deleted since deleting changes them
+                item_ids = []
 
                 for checklist_rank in checklist_ranks:
-                    checklist_rank = str(checklist_rank)
-                    
-                    checks.check_task_id(obj.id)
-                    checks.check_checklist(obj.id, checklist_rank)
+                    checks.check_checklist(obj.id, str(checklist_rank))
+                    item_ids.append(apputils.get_checklist_item_id(checklist_rank, obj.id))
 
-                    if checklist_rank.isdigit():
-                        item_name = apputils.get_checklist_item(checklist_rank, obj.id)
-                        fileutils.delete_item(item_type='checklist', object_id=obj.id, item_name=item_name)
-                    else:
-                        fileutils.delete_item(item_type='checklist', object_id=obj.id, item_name=checklist_rank)
-                
-                show(object_rank=object_rank)
+                for item_id in item_ids:
+                    fileutils.delete_item(item_type='checklist', object_id=obj.id, item_id=item_id)
+                    apputils.print_change('deleted', obj, item_id=item_id)
+
+                shown_ids.append(obj.id)
 
         elif isinstance(obj, List):
             checks.check_if_in_main_menu()
             checks.check_list_id(obj.id)
-            fileutils.delete_list(obj.id)
 
-            show()
+            roots.append(obj)
+            shown_ids.append(None)
 
         elif isinstance(obj, Workspace):
             checks.check_workspace_id(obj.id)
-            delete = typer.confirm(f"Are you sure you want to delete the workspace '{obj.name}'")
 
-            if delete:
-                fileutils.delete_workspace(obj.id)
-                checks.check_current_workspace(obj.id)
-                show()
-                
+            if dry_run or typer.confirm(f"Are you sure you want to delete the workspace '{obj.name}'"):
+                roots.append(obj)
+                shown_ids.append(None)
+
             else:
                 rprint('[bold red]Aborted.[/]')
-                
+
+    from td.utils.cascade import Cascade
+
+    cascade = Cascade(fileutils.store, roots)
+
+    if dry_run:
+        apputils.print_cascade(cascade, fileutils.reclaimed_bytes(cascade))
+        return
+
+    fileutils.delete_cascade(cascade)
+
+    for obj in roots:
+        if isinstance(obj, Workspace):
+            checks.check_current_workspace(obj.id)
+
+        apputils.print_change('deleted', obj)
+
+    if shown_ids != []:
+        show_changed(shown_ids)
+
 @app.command(rich_help_panel="Utilities")
+@apputils.transactional
 def show(
     show_all: Annotated[bool, typer.Option('--all', '-a', help="Show task including descriptions and checklists")] = False,
     show_workspaces: Annotated[bool, typer.Option('--workspaces', '-w', help="Show all workspaces")] = False,
     object_rank: Annotated[int, typer.Option('--id', '-i', help="If specified, show detailed information about the object")]=None,
     show_completed_only: Annotated[bool, typer.Option('--completed', '-c', help='Show only completed tasks')] = False,
-    show_undone_only: Annotated[bool, typer.Option('--undone', '-u', help='Show undone tasks only')] = False
+    show_undone_only: Annotated[bool, typer.Option('--undone', '-u', help='Show undone tasks only')] = False,
+    limit: Annotated[int, typer.Option('--limit', '-n', min=1, help="Show at most this many tasks of every list")] = None,
+    page: Annotated[int, typer.Option('--page', '-p', min=1, help="Show this page of every list, pages are --limit tasks long")] = None,
+    offset: Annotated[int, typer.Option('--offset', '-o', min=0, help="Skip this many tasks of every list")] = 0,
+    pager: Annotated[bool, typer.Option('--pager', help="Show everything in a pager")] = False,
+    as_json: Annotated[bool, typer.Option('--json', help="Print a JSON array with a record for every workspace, list and task shown")] = False,
+    as_ndjson: Annotated[bool, typer.Option('--ndjson', help="Print a JSON record per line for every workspace, list and task shown")] = False
 ):
     """
     [bold yellow]Shows all tasks[/bold yellow]
@@ -248,8 +360,20 @@ def show(
     fileutils.check_existance()
     checks.check_file()
 
-    all_tasks = fileutils.get_tasks()
-    all_lists = fileutils.get_lists()
+    # Only the tasks in window are printed, their ranks stay the same as without it
+    window = None
+
+    if page is not None:
+        if offset != 0:
+            raise typer.BadParameter("Use either --page or --offset, not both")
+
+        if limit is None:
+            limit = apputils.PAGE_SIZE
+
+        offset = (page - 1) * limit
+
+    if limit is not None or offset != 0:
+        window = (offset, limit)
 
     # Reset them if both are enabled
     if show_completed_only and show_undone_only:
@@ -264,88 +388,87 @@ def show(
         if object_rank is None:
             show_workspaces = True
 
-    if show_workspaces:
-        # TODO: generate ranks here
-        objects = fileutils.get_workspaces()
-        unused_ranks = list(range(1, len(objects)+1))
-        ws_ranks = apputils.generate_ranks(objects, unused_ranks)
-
-        apputils.print_all_workspaces(ws_ranks)
-    
-    else:
-        if object_rank == None:
-            # If printing all lists
-            c_ws_id = fileutils.get_current_workspace_id()
-            c_ws = apputils.get_workspace_from_id(c_ws_id)
+    if as_json and as_ndjson:
+        raise typer.BadParameter("Use either --json or --ndjson, not both")
 
-            ws_list_ranks = apputils.get_ranks_of_lists_in_workspace(c_ws)
+    # With --json or --ndjson records are written instead of printing anything with rich
+    if as_json or as_ndjson:
+        from td.utils.jsonutils import RecordWriter
 
-            apputils.print_workspace(c_ws, ws_list_ranks[0][1])
+        writer = RecordWriter(ndjson=as_ndjson)
+    else:
+        writer = nullcontext()
 
-            lists = apputils.get_lists_in_workspace(c_ws)
-            
-            all_task_ranks = []
+    with apputils.paged() if pager else nullcontext(), writer:
+        if show_workspaces:
+            rank_map = apputils.get_rank_map()
 
-            for ls in lists:
-                used_ranks = ws_list_ranks + all_task_ranks
-                used_ranks.sort(key= lambda rank: rank[1])
-                ranks_of_tasks_in_list = apputils.get_ranks_of_tasks_in_list(c_ws, ls, used_ranks)
-                all_task_ranks += ranks_of_tasks_in_list
+            if as_json or as_ndjson:
+                apputils.write_all_workspaces(writer, rank_map)
+            else:
+                apputils.print_all_workspaces(rank_map)
 
-                apputils.print_list(ls, ws_list_ranks.pop(1)[1], ranks_of_tasks_in_list, show_completed_only, show_undone_only, with_description=show_all)
+            fileutils.remember_ranks(rank_map)
         
         else:
-            # If printing a specific object
-            obj = apputils.get_object_from_rank(object_rank)
-            
-            # If the object is a task
-            if isinstance(obj, Task):
+            if object_rank == None:
+                # If printing all lists
+                c_ws_id = fileutils.get_current_workspace_id()
+                c_ws = apputils.get_workspace_from_id(c_ws_id)
 
-                for task in all_tasks:
-                    if task.id == obj.id:
-                        apputils.print_task(task)
-                        break
+                rank_map = apputils.get_rank_map(c_ws)
 
-            elif isinstance(obj, List):
-                # If the object is a list
-                for ls in all_lists:
-                    if ls.id == obj.id:
-                        c_ws_id = fileutils.get_current_workspace_id()
-                        c_ws = apputils.get_workspace_from_id(c_ws_id)
-                        
-                        ws_list_ranks = apputils.get_ranks_of_lists_in_workspace(c_ws)
-                        
-                        # Getting the ranks of the tasks in a list
-                        ranks_of_tasks_in_workspace = apputils.get_ranks_of_tasks_in_workspace(c_ws)
+                if as_json or as_ndjson:
+                    apputils.write_workspace(writer, c_ws, rank_map, show_completed_only, show_undone_only, window)
 
-                        ranks_of_tasks_in_list = []
+                else:
+                    apputils.print_workspace(c_ws, rank_map.get_rank(c_ws.id))
 
-                        for rank in ranks_of_tasks_in_workspace:
-                            if rank[0] in ls.task_ids:
-                                ranks_of_tasks_in_list.append(rank)
+                    for ls in apputils.get_lists_in_workspace(c_ws):
+                        apputils.print_list(ls, rank_map, show_completed_only, show_undone_only, with_description=show_all, window=window)
 
-                        apputils.print_list(ls, object_rank, ranks_of_tasks_in_list, show_completed_only, show_undone_only, with_description=True)
-                        break
+                fileutils.remember_ranks(rank_map)
+            
+            else:
+                # If printing a specific object
+                obj = apputils.get_object_from_rank(object_rank)
+                
+                # If the object is a task
+                if isinstance(obj, Task):
+                    if as_json or as_ndjson:
+                        c_ws = apputils.get_workspace_from_id(fileutils.get_current_workspace_id())
+                        apputils.write_task(writer, obj, apputils.get_rank_map(c_ws))
+                    else:
+                        apputils.print_task(obj)
 
-            elif isinstance(obj, Workspace):
-                ws_list_ranks = apputils.get_ranks_of_lists_in_workspace(obj)
+                elif isinstance(obj, List):
+                    # If the object is a list
+                    c_ws_id = fileutils.get_current_workspace_id()
+                    c_ws = apputils.get_workspace_from_id(c_ws_id)
 
-                apputils.print_workspace(obj, ws_list_ranks[0][1])
+                    rank_map = apputils.get_rank_map(c_ws)
 
-                lists = apputils.get_lists_in_workspace(obj)
-                
-                all_task_ranks = []
+                    if as_json or as_ndjson:
+                        apputils.write_list(writer, obj, rank_map, show_completed_only, show_undone_only, window)
+                    else:
+                        apputils.print_list(obj, rank_map, show_completed_only, show_undone_only, with_description=True, window=window)
 
-                for ls in lists:
-                    used_ranks = ws_list_ranks + all_task_ranks
-                    used_ranks.sort(key= lambda rank: rank[1])
-                    ranks_of_tasks_in_list = apputils.get_ranks_of_tasks_in_list(obj, ls, used_ranks)
-                    
-                    all_task_ranks += ranks_of_tasks_in_list
+                    fileutils.remember_ranks(rank_map)
+
+                elif isinstance(obj, Workspace):
+                    rank_map = apputils.get_rank_map(obj)
+
+                    if as_json or as_ndjson:
+                        apputils.write_workspace(writer, obj, rank_map, show_completed_only, show_undone_only, window)
 
-                    apputils.print_list(ls, ws_list_ranks.pop(1)[1], ranks_of_tasks_in_list, show_completed_only, show_undone_only)
+                    else:
+                        apputils.print_workspace(obj, rank_map.get_rank(obj.id))
+
+                        for ls in apputils.get_lists_in_workspace(obj):
+                            apputils.print_list(ls, rank_map, show_completed_only, show_undone_only, window=window)
 
 @app.command(rich_help_panel="Utilities")
+@apputils.transactional
 def rename(
     object_rank: Annotated[int, typer.Argument(help="The id of the thing you want to change")],
     new_name: Annotated[str, typer.Argument(help="What you want the new name to be")]
@@ -370,9 +493,11 @@ def rename(
         checks.check_workspace_id(obj.id)
         fileutils.rename_workspace(obj.id, new_name)
     
-    show(object_rank=object_rank)
+    apputils.print_change('renamed', obj)
+    show_changes(object_rank=object_rank)
 
 @app.command(rich_help_panel='Utilities')
+@apputils.transactional
 def edit(
     item_type: Annotated[str, typer.Argument(callback=checks.check_item, help="The type of item you want to edit (description, importance, checklist)")],
     object_rank: Annotated[int, typer.Argument(help='Specify the ID of the object you want to edit')],
@@ -399,9 +524,11 @@ def edit(
                 if checklist_rank == "":
                     raise typer.BadParameter(f"Name/rank not provided. Use the -r option to provide a rank.")  
                 checks.check_checklist(obj.id, checklist_rank)
-                item_name = apputils.get_checklist_item(checklist_rank, obj.id)
-                fileutils.edit_task(item_type='checklist', new_item=new_item, object_id=obj.id, item_name=item_name)
-                show(object_rank=object_rank)
+                item_id = apputils.get_checklist_item_id(checklist_rank, obj.id)
+                fileutils.edit_task(item_type='checklist', new_item=new_item, object_id=obj.id, item_id=item_id)
+
+                apputils.print_change('edited', obj, item_id=item_id)
+                show_changes(object_rank=object_rank)
             else:
                 if item_type == 'importance':
                     checks.check_importance(int(new_item))
@@ -409,153 +536,44 @@ def edit(
                 # This does both importance and description
                 fileutils.edit_task(item_type=item_type, new_item=new_item, object_id=obj.id)
                 
-                show(object_rank=object_rank)
+                apputils.print_change('edited', obj)
+                show_changes(object_rank=object_rank)
             
             break
 
 @app.command(rich_help_panel="Utilities")
+@apputils.transactional
 def done(
     object_ranks: Annotated[typing_List[int], typer.Argument(help="The ID of the thing you want to marke as completed or the ID of the thing to which the checklist item belongs")],
     checklist_ranks: Annotated[typing_List[str], typer.Option('--rank', '-r', help="The rank or the name of the checklist item you want to edit")] = [],
 ):
-    fileutils.check_existance()
-    checks.check_file()
-
-    checks.check_if_in_main_menu()
-
-    for object_rank in object_ranks:
-
-        obj = apputils.get_object_from_rank(object_rank)
-
-        try:
-            checks.check_task_id(obj.id)
-
-            if checklist_ranks == []:
-                # Task is being marked as completed
-                # Checks for if the id belongs to a task or not
-                fileutils.mark_task_as_done(obj.id)
-
-                c_ws_id = fileutils.get_current_workspace_id()
-                c_ws = apputils.get_workspace_from_id(c_ws_id)
-
-                parent_ls = apputils.get_parent_list(obj)
-                ls_rank = apputils.get_rank_from_list_id(parent_ls.id, c_ws)
-                
-                show(object_rank=ls_rank)
-            
-            else:
-                # Checklist item being marked as completed
-                
-                if 'all' in checklist_ranks:
-
-                    for checklist_item in obj.checklist:
-                        if checklist_item != '':
-                            fileutils.mark_checklist_item_as_done(obj.id, checklist_item[:-1])
-
-                else:
-                    apputils.adjust_checklist_ranks(checklist_ranks, marking_as_done=True)
-
-                    for checklist_rank in checklist_ranks:
-
-                        checks.check_checklist(obj.id, checklist_rank)
-                        item_name = apputils.get_checklist_item(checklist_rank, obj.id)
-                        fileutils.mark_checklist_item_as_done(obj.id, item_name)
-
-                    c_ws_id = fileutils.get_current_workspace_id()
-                    c_ws = apputils.get_workspace_from_id(c_ws_id)
-
-                    task_rank = apputils.get_rank_from_task_id(obj.id, c_ws)
-
-                    show(object_rank=task_rank)
-
-        except typer.BadParameter:
-            pass
-
-        try:
-            checks.check_list_id(obj.id)
-
-            for task_id in obj.task_ids:
-                fileutils.mark_task_as_done(task_id)
-
-            show(object_rank)
-
-        except typer.BadParameter:
-            pass
+    mark_objects(object_ranks, checklist_ranks, done=True)
 
 @app.command(rich_help_panel="Utilities")
+@apputils.transactional
 def undone(
     object_ranks: Annotated[typing_List[int], typer.Argument(help="The ID of the thing you want to marke as completed or the ID of the thing to which the checklist item belongs")],
     checklist_ranks: Annotated[typing_List[str], typer.Option('--rank', '-r', help="The rank or the name of the checklist item you want to edit")] = []
 ):
-    
-    fileutils.check_existance()
-    checks.check_file()
-
-    checks.check_if_in_main_menu()
-    
-    for object_rank in object_ranks:
-
-        obj = apputils.get_object_from_rank(object_rank)
-
-        try:
-            checks.check_task_id(obj.id)
-            if checklist_ranks == []:
-                # Task being marked as undone
-                fileutils.mark_task_as_undone(obj.id)
-
-                c_ws_id = fileutils.get_current_workspace_id()
-                c_ws = apputils.get_workspace_from_id(c_ws_id)
-
-                parent_ls = apputils.get_parent_list(obj)
-                ls_rank = apputils.get_rank_from_list_id(parent_ls.id, c_ws)
-                
-                show(object_rank=ls_rank)
-
-            else:
-                # Checklist item being marked as undone
-                if 'all' in checklist_ranks:
-
-                    for checklist_item in obj.checklist:
-                        if checklist_item != '':
-                            fileutils.mark_checklist_item_as_undone(obj.id, checklist_item[:-1])
-                
-                else:    
-                    apputils.adjust_checklist_ranks(checklist_ranks)
-
-                    for checklist_rank in checklist_ranks:
-
-                        checks.check_checklist(obj.id, checklist_rank)
-                        item_name = apputils.get_checklist_item(checklist_rank, obj.id)
-                        fileutils.mark_checklist_item_as_undone(obj.id, item_name)
-                
-                c_ws_id = fileutils.get_current_workspace_id()
-                c_ws = apputils.get_workspace_from_id(c_ws_id)
-
-                task_rank = apputils.get_rank_from_task_id(obj.id, c_ws)
-                show(object_rank=task_rank)
-
-        except typer.BadParameter:
-            pass
-
-        try:
-            checks.check_list_id(obj.id)
-
-            for task_id in obj.task_ids:
-                fileutils.mark_task_as_undone(task_id)
-
-            show()
-
-        except typer.BadParameter:
-            pass
+    mark_objects(object_ranks, checklist_ranks, done=False)
 
 @app.command()
+@apputils.transactional
 def count(
     typ: Annotated[str, typer.Argument(callback=checks.check_count_type, help='Count the number of completed or uncompleted tasks.')],
-    object_id: Annotated[int, typer.Option('--id', '-i', help='The id of the task or list in which you want to count the number of completed items')] = None
+    object_id: Annotated[int, typer.Option('--id', '-i', help='The id of the task or list in which you want to count the number of completed items')] = None,
+    as_json: Annotated[bool, typer.Option('--json', help="Print the count as a JSON array with one record")] = False,
+    as_ndjson: Annotated[bool, typer.Option('--ndjson', help="Print the count as a single JSON record")] = False
 ):
     fileutils.check_existance()
     checks.check_file()
 
+    if as_json and as_ndjson:
+        raise typer.BadParameter("Use either --json or --ndjson, not both")
+
+    # The object the count is for, None for the current workspace
+    obj = None
+
     # Variables used to print the progres bar
     num_to_be_counted = 0
 
@@ -564,6 +582,9 @@ def count(
 
     total = 0
 
+    from rich.table import Table
+    from rich import box
+
     table = Table(show_header=True, show_edge=False, show_footer=False, show_lines=False, box=box.SIMPLE_HEAD)
 
     if typ in ['done', 'd', 'completed']:
@@ -616,16 +637,17 @@ def count(
                     if not task.completed:
                         num_to_be_counted += 1
         
-            text = f"[italic #4BFFF6] in list '{obj.name}' [/italic #4BFFF6]"
+            if not (as_json or as_ndjson):
+                text = f"[italic #4BFFF6] in list '{obj.name}' [/italic #4BFFF6]"
 
-            print()
-            apputils.center_print(text)
+                print()
+                apputils.center_print(text)
 
         elif isinstance(obj, Task):
             checks.check_if_in_main_menu()
 
 
-            total = len(obj.checklist)
+            total = obj.num_items
 
             if count_completed:
                 num_to_be_counted = obj.num_done
@@ -633,10 +655,11 @@ def count(
             else:
                 num_to_be_counted = obj.num_undone
             
-            text = f"[italic #4BFFF6] in task '{obj.name}' [/italic #4BFFF6]"
+            if not (as_json or as_ndjson):
+                text = f"[italic #4BFFF6] in task '{obj.name}' [/italic #4BFFF6]"
 
-            print()
-            apputils.center_print(text)
+                print()
+                apputils.center_print(text)
 
         elif isinstance(obj, Workspace):
             all_lists = apputils.get_lists_in_workspace(obj)
@@ -656,6 +679,14 @@ def count(
                         if not task.completed:
                             num_to_be_counted += 1
 
+    if as_json or as_ndjson:
+        from td.utils.jsonutils import RecordWriter, count_record
+
+        with RecordWriter(ndjson=as_ndjson) as writer:
+            writer.write(count_record(num_to_be_counted, total, count_completed, obj, object_id))
+
+        return
+
     table.add_row(f"{num_to_be_counted} out of {total}")
     
     print()
@@ -665,8 +696,11 @@ def count(
     print('\n')
 
 @app.command()
+@apputils.transactional
 def config():
-    
+    # inquirer is slow to import and only needed here
+    import inquirer
+
     fileutils.check_existance()
     checks.check_file()
 
@@ -703,6 +737,7 @@ def config():
 
 
 @app.command()
+@apputils.transactional
 def move(
     object_rank: Annotated[int, typer.Argument()] = None,
     location_rank: Annotated[int, typer.Option('--location', '-l', help="Where you want to move the task to.")] = None,
@@ -725,15 +760,15 @@ def move(
         c_ws_id = fileutils.get_current_workspace_id()
         c_ws = apputils.get_workspace_from_id(c_ws_id)
 
-        tasks = apputils.get_tasks_in_workspace(c_ws)
+        tasks = [task for task in apputils.get_tasks_in_workspace(c_ws) if task.completed]
+
+        # Every task is moved in one go
+        fileutils.move_tasks([task.id for task in tasks], ls.id)
 
         for task in tasks:
-            if task.completed:
-                fileutils.delete_task(task.id)
-                fileutils.add_task_to_file(task)
-                fileutils.add_task_to_list(ls.id, task.id)
+            apputils.print_change('moved', task)
         
-        show(object_rank=location_rank)
+        show_changes(object_rank=location_rank)
 
     else:
         obj = apputils.get_object_from_rank(object_rank)
@@ -742,7 +777,8 @@ def move(
         if isinstance(obj, Workspace):
             fileutils.set_current_workspace(obj.id)
 
-            show()
+            apputils.print_change('moved', obj)
+            show_changes()
 
         elif isinstance(obj, Task):
             
@@ -754,62 +790,164 @@ def move(
             if not isinstance(ls, List):
                 raise typer.BadParameter("Location specified isn't a list!")
             
-            fileutils.delete_task(obj.id)
-            fileutils.add_task_to_file(obj)
-            fileutils.add_task_to_list(ls.id, obj.id)
+            fileutils.move_tasks([obj.id], ls.id)
 
-            show(object_rank=location_rank)
+            apputils.print_change('moved', obj)
+            show_changes(object_rank=location_rank)
 
 @app.command()
+@apputils.transactional
 def clear(
     object_ranks: Annotated[typing_List[int], typer.Argument(help="IDs of lists or tasks you want to clear")] = None
 ):
     checks.check_if_in_main_menu()
 
-    if object_ranks == []:
+    # The completed tasks are all deleted together at the end
+    tasks = []
+
+    if not object_ranks:
         c_ws_id = fileutils.get_current_workspace_id()
         c_ws = apputils.get_workspace_from_id(c_ws_id)
 
-        lists = apputils.get_lists_in_workspace(c_ws)
-
-        for ls in lists:
-            tasks = apputils.get_tasks_in_list(ls)
-            
-            if tasks is not None:
-                
-                for task in tasks:
-                    if task.completed:
-                        fileutils.delete_task(task.id)
+        for ls in apputils.get_lists_in_workspace(c_ws):
+            tasks += [task for task in apputils.get_tasks_in_list(ls) if task.completed]
         
     else:
-        for object_rank in object_ranks:
-            obj = apputils.get_object_from_rank(object_rank)
-            
-            if isinstance(obj, List):
-                tasks = apputils.get_tasks_in_list(obj)
+        # Clearing changes the ranks so they're all turned into objects first
+        objs = [apputils.get_object_from_rank(object_rank) for object_rank in object_ranks]
 
-                if tasks is not None:
-                    for task in tasks:
-                        if task.completed:
-                            fileutils.delete_task(task.id)
+        for object_rank, obj in zip(object_ranks, objs):
+            if isinstance(obj, List):
+                tasks += [task for task in apputils.get_tasks_in_list(obj) if task.completed]
 
             elif isinstance(obj, Task):
-                for item in obj.checklist:
-                    if item[-1] == '1':
-                        fileutils.delete_item("checklist", obj.id, item[:-1])
+                # Copied since deleting items changes the checklist
+                for item in list(obj.checklist):
+                    if item.done:
+                        fileutils.delete_item("checklist", obj.id, item_id=item.id)
+                        apputils.print_change('deleted', obj, item_id=item.id)
             
             else:
                 raise typer.BadParameter(f"The id '{object_rank}' doesn't belong to a list or task")
-        
-    show()
+
+    # A list can be given more than once
+    tasks = list({task.id: task for task in tasks}.values())
+    fileutils.delete_tasks(task.id for task in tasks)
+
+    for task in tasks:
+        apputils.print_change('deleted', task)
+
+    show_changes()
+
+@app.command("import", rich_help_panel="Utilities")
+@apputils.transactional
+def import_tasks(
+    path: Annotated[str, typer.Argument(help="The CSV or NDJSON file with the tasks, - to read them from stdin")] = '-',
+    file_format: Annotated[str, typer.Option('--format', '-f', help="csv or ndjson. Worked out from the file name or the first line if it isn't given")] = None
+):
+    """
+    [bold yellow]Adds every task in a CSV or NDJSON file, creating the lists and workspaces they're in[/bold yellow]
+    """
+    fileutils.check_existance()
+    checks.check_file()
+
+    from td.utils.importer import Importer, open_lines
+
+    importer = Importer(fileutils)
+
+    if path == '-':
+        lines, file_format = open_lines(sys.stdin, path, file_format)
+        importer.import_lines(lines, file_format)
+
+    else:
+        try:
+            with open(path, newline='') as f:
+                lines, file_format = open_lines(f, path, file_format)
+                importer.import_lines(lines, file_format)
+
+        except FileNotFoundError:
+            raise typer.BadParameter(f"{path} doesn't exist!")
+
+    rprint(f"[bold green]Imported {importer.num_tasks} tasks, added {importer.num_lists} lists and {importer.num_workspaces} workspaces[/]")
+
+@app.command(rich_help_panel="Utilities")
+def batch(
+    path: Annotated[str, typer.Argument(help="The file with the commands, one per line without td in front, - to read them from stdin")] = '-',
+    checkpoint: Annotated[int, typer.Option('--checkpoint', help="Write the changes after every N commands instead of once at the end")] = 0
+):
+    """
+    [bold yellow]Runs td commands read from a file or stdin, resolving every ID against the IDs from when it started[/bold yellow]
+    """
+    from td.batch import run_batch
+
+    fileutils.check_existance()
+    checks.check_file()
+
+    if checkpoint < 0:
+        raise typer.BadParameter("The checkpoint can't be negative")
+
+    if path == '-':
+        num_run = run_batch(app, sys.stdin, fileutils, checkpoint)
+
+    else:
+        try:
+            with open(path) as f:
+                num_run = run_batch(app, f, fileutils, checkpoint)
+
+        except FileNotFoundError:
+            raise typer.BadParameter(f"{path} doesn't exist!")
+
+    rprint(f"[bold green]Ran {num_run} commands[/]")
+
+@app.command(rich_help_panel="Utilities")
+def migrate():
+    """
+    [bold yellow]Imports td.txt into td.db so it can be used with TD_BACKEND=sqlite[/bold yellow]
+    """
+    from td.utils.sqliteutils import SqliteFileutils
+
+    text_fileutils = Fileutils(PATH, CONFIGPATH)
+    text_fileutils.check_existance()
+
+    if not text_fileutils.check_format():
+        raise typer.BadParameter(f"{PATH} has been modified and can't be imported!")
+
+    db_fileutils = SqliteFileutils(apputils.DBPATH, CONFIGPATH)
+
+    if db_fileutils.get_all_ids() != [] and not typer.confirm(f"Are you sure you want to replace everything in {apputils.DBPATH}"):
+        rprint('[bold red]Aborted.[/]')
+        return
+
+    store = text_fileutils.store
+
+    # Everything is inserted in a single transaction
+    with db_fileutils.connection:
+        db_fileutils.import_store(store)
+
+    rprint(f"[bold green]Imported {len(store.tasks)} tasks, {len(store.lists)} lists and {len(store.workspaces)} workspaces into {apputils.DBPATH}[/]")
+
+@app.command(rich_help_panel="Utilities")
+def serve():
+    """
+    [bold yellow]Keeps td running so commands run in this directory start faster[/bold yellow]
+    """
+    from td.server import serve as serve_commands
+
+    fileutils.check_existance()
+    checks.check_file()
+
+    rprint(f"[bold green]Serving td on {apputils.SOCKET_PATH}[/]")
+
+    serve_commands(app, apputils.SOCKET_PATH)
 
 @app.command()
+@apputils.transactional
 def exit():
     # Set the current workspace to an id no object can have
     # When the id is 0 - the user is in the main menu
     fileutils.set_current_workspace(0)
 
-    show()
+    show_changes()
 
 if __name__ == "__main__":
     app()
@@ -2,160 +2,230 @@ import typer
 from rich.console import Console
 from rich.table import Table
 from rich.align import Align
+from rich.cells import cell_len
 from rich import box
-from rich.markdown import Markdown
-from rich.progress import Progress, TextColumn, BarColumn, MofNCompleteColumn
 from td.utils.tasks import Task
 from td.utils.lists import List
 from td.utils.workspaces import Workspace
-from td.utils.config import get_config
+from td.utils.config import load_config
 from td.utils.checks import Checks
 from td.utils.fileutils import Fileutils
+from td.utils.ranks import RankMap, tasks_in_list, lists_in_workspace
+from td.utils.progress import make_progress_bar
 from shutil import get_terminal_size
+from contextlib import contextmanager
+from itertools import islice
+import io
+import os
+import sys
+from functools import wraps
 
 # TODO: Make the changes happen by default
 PATH = "td.txt" # Change this to testtd.txt when testing
 CONFIGPATH = "config.txt" # Change this to testconfig.txt when testing
-checks = Checks(PATH, CONFIGPATH)
-fileutils = Fileutils(PATH, CONFIGPATH)
+
+DBPATH = "td.db"
+
+# With TD_JOURNAL=1 changes are appended to td.txt.journal instead of rewriting td.txt
+JOURNAL = os.environ.get('TD_JOURNAL', '0') == '1'
+
+# With TD_BACKEND=sqlite everything is kept in td.db instead (td migrate imports td.txt into it)
+BACKEND = os.environ.get('TD_BACKEND', 'text')
+
+# td serve listens here and the td command sends commands to it when it's running
+SOCKET_PATH = os.environ.get('TD_SOCKET', 'td.sock')
+
+# Set by td --quiet (or TD_QUIET=1) for every command. Commands that change something then
+# print a line for each change (see print_change) instead of showing the workspace afterwards
+QUIET = False
+
+# show prints the tasks of a list this many at a time so a huge list starts appearing straight away
+ROWS_PER_CHUNK = 100
+
+# The number of tasks a page has when show --page is used without --limit
+PAGE_SIZE = 50
+
+# The rank maps every command resolves ranks against while td batch runs (see frozen_ranks)
+frozen_rank_maps = None
+
+# A single Fileutils is shared by everything so td.txt is parsed once per command
+if BACKEND == 'sqlite':
+    # sqlite3 is only imported when it's used
+    from td.utils.sqliteutils import SqliteFileutils
+
+    fileutils = SqliteFileutils(DBPATH, CONFIGPATH)
+else:
+    fileutils = Fileutils(PATH, CONFIGPATH, journal=JOURNAL)
+
+checks = Checks(fileutils.PATH, CONFIGPATH, fileutils)
 
 console = Console()
 
-class CenteredProgress(Progress):
+def transactional(command):
     """
-    same as rich's progress bar but centered
+    Runs a command inside a transaction so everything it changes
+    is written to td.txt in one go when it finishes
     """
-    def get_renderable(self):
-        return Align.center(super().get_renderable())
+    @wraps(command)
+    def wrapper(*args, **kwargs):
+        with fileutils.transaction():
+            return command(*args, **kwargs)
 
-def get_terminal_width():
-    terminal_width, _ = get_terminal_size()
-
-    return terminal_width
+    return wrapper
 
-def center_print(text: str, style: str = ""):
-    width = get_terminal_width()
-    console.print(Align.center(text, width=width), style=style)
-
-def get_checklist_item(rank: int, object_id: int) -> str:
+@contextmanager
+def paged():
     """
-    Returns the name of the item
+    Everything printed inside is shown in a pager ($PAGER or less) once it's done
     """
-    all_tasks = fileutils.get_tasks()
+    global console
 
-    for task in all_tasks:
-        if object_id == task.id:
-            break
+    import pydoc
 
-    task.checklist.sort(key = lambda item: item[-1])
-    return task.checklist[int(rank)-1][:-1]
+    real_console = console
+    real_stdout = sys.stdout
+    buffer = io.StringIO()
 
-def get_parent_list(task: Task) -> List:
-    all_lists = fileutils.get_lists()
+    # Written with the colours and width of the terminal the pager is shown in
+    console = Console(file=buffer, width=get_terminal_width(), force_terminal=real_console.is_terminal)
+    sys.stdout = buffer
 
-    for ls in all_lists:
-        if task.id in ls.task_ids:
-            return ls
+    try:
+        yield
 
-def get_parent_workspace(ls: List) -> Workspace:
-    all_workspaces = fileutils.get_workspaces()
+    finally:
+        console = real_console
+        sys.stdout = real_stdout
 
-    for ws in all_workspaces:
-        if ls.id in ws.list_ids:
-            return ws    
+    # Lets less show the colours
+    os.environ.setdefault('LESS', '-R')
 
-def adjust_ranks(object_ranks: list):
-    object_ranks.sort()
+    pydoc.pager(buffer.getvalue())
 
-    if len(object_ranks) > 1:
-        decrement_value = 0
+def print_change(action: str, obj, rank: int = None, item_id: int = None) -> None:
+    """
+    Prints what a command changed in quiet mode, e.g. 'added task id=12 rank=7'.
+    For checklist items id is the id of the task and item the id of the item in it.
+    In td batch the rank is left out, what was added has no rank in the frozen ranks
+    the other commands of the batch use
+    """
+    if not QUIET:
+        return
+
+    if item_id is not None:
+        line = f"{action} checklist id={obj.id} item={item_id}"
+    elif isinstance(obj, Task):
+        line = f"{action} task id={obj.id}"
+    elif isinstance(obj, List):
+        line = f"{action} list id={obj.id}"
+    else:
+        line = f"{action} workspace id={obj.id}"
 
-        for index, _ in enumerate(object_ranks):
+    if rank is not None and frozen_rank_maps is None:
+        line += f" rank={rank}"
 
-            object_ranks[index] -= decrement_value
+    print(line)
 
-            decrement_value += 1
+def print_cascade(cascade: 'Cascade', size: int) -> None:
+    """
+    What td del --dry-run would delete. In quiet mode every object is printed as well
+    """
+    if QUIET:
+        store = fileutils.store
 
-def adjust_checklist_ranks(object_ranks: list, marking_as_done: bool = False):
-    
-    object_ranks.sort(key=lambda rank: int(rank))
+        for object_id in cascade.task_ids + cascade.list_ids + cascade.workspace_ids:
+            print_change('would delete', store.locate(object_id)[1])
+
+    console.print(
+        f"[bold yellow]Would delete {len(cascade.workspace_ids)} workspaces, {len(cascade.list_ids)} lists, "
+        f"{len(cascade.task_ids)} tasks and {cascade.num_items} checklist items, freeing {size} bytes[/]"
+    )
+
+def get_terminal_width():
+    terminal_width, _ = get_terminal_size()
 
-    if len(object_ranks) > 1:
-        decrement_value = 0
+    return terminal_width
 
-        for index, _ in enumerate(object_ranks):
-            if not marking_as_done:
-                try:
-                    object_ranks[index + 1]
+def center_print(text: str, style: str = ""):
+    width = get_terminal_width()
+    console.print(Align.center(text, width=width), style=style)
 
-                except IndexError:
-                    return
-                
-            object_ranks[index] = int(object_ranks[index])
+def get_checklist_item_id(rank: str, object_id: int) -> int:
+    """
+    Returns the id of the item with the rank (the number it has in show -i) or the name given
+    """
+    task = fileutils.store.get_task(object_id)
+    rank = str(rank)
+
+    if not rank.isdigit():
+        return task.checklist.ids[task.checklist.index(rank)]
 
-            if marking_as_done:
-                object_ranks[index] -= decrement_value
-                decrement_value += 1
+    checklist = sorted(task.checklist, key=lambda item: item.done)
+    return checklist[int(rank)-1].id
 
-            # converting back to a string to make it usable by the rest of the program
-            # TODO: make it so that int is accepted everywhere instead of strings
-            object_ranks[index] = str(object_ranks[index])
+def get_parent_list(task: Task) -> List:
+    return fileutils.store.get_parent_list(task.id)
+
+def get_parent_workspace(ls: List) -> Workspace:
+    return fileutils.store.get_parent_workspace(ls.id)
 
 def print_task(task: Task):
     
-    CONFIGS = get_config(CONFIGPATH)
+    CONFIGS = load_config(CONFIGPATH)
 
-    task.name = format_task_name(task)
+    name = format_task_name(task)
+    description = task.description
     ls = get_parent_list(task)
 
     title = f"[italic {CONFIGS['LIST_NAME_COLOR']}]in list '{ls.name}'[/italic {CONFIGS['LIST_NAME_COLOR']}]\n"
     
     table = Table(show_header=True, show_edge=False, show_footer=False, show_lines=False, box=box.SIMPLE_HEAD)
     
-    table.add_column('ID', header_style=CONFIGS['TASK_ID_COLOR'], style=CONFIGS['TASK_ID_COLOR'], justify='center')
-    table.add_column('Name', header_style=CONFIGS['TASK_NAME_COLOR'], style=CONFIGS['TASK_NAME_COLOR'], justify='center')
-    table.add_column('Imp', header_style=CONFIGS['IMPORTANCE_HEADER_COLOR'], justify='center')
+    table.add_column('ID', header_style=CONFIGS.style('TASK_ID_COLOR'), style=CONFIGS.style('TASK_ID_COLOR'), justify='center')
+    table.add_column('Name', header_style=CONFIGS.style('TASK_NAME_COLOR'), style=CONFIGS.style('TASK_NAME_COLOR'), justify='center')
+    table.add_column('Imp', header_style=CONFIGS.style('IMPORTANCE_HEADER_COLOR'), justify='center')
     table.add_column('Status', justify='center')
 
     rank = str(get_rank_of_task(task)[1])
 
     if task.completed:
-        table.add_row(rank, task.name, str(task.importance), 'Completed')
+        table.add_row(rank, name, str(task.importance), 'Completed')
     else:
-        table.add_row(rank, task.name, str(task.importance), 'Not completed')
+        table.add_row(rank, name, str(task.importance), 'Not completed')
 
     checklist_table = Table(show_header=True, show_edge=False, show_footer=False, show_lines=False, box=box.SIMPLE_HEAD)
 
-    checklist_table.add_column('Rank', style=CONFIGS['TASK_ID_COLOR'], justify='center')
-    checklist_table.add_column('Name', style=CONFIGS['TASK_NAME_COLOR'], justify='center')
+    checklist_table.add_column('Rank', style=CONFIGS.style('TASK_ID_COLOR'), justify='center')
+    checklist_table.add_column('Name', style=CONFIGS.style('TASK_NAME_COLOR'), justify='center')
     checklist_table.add_column('Status', style='#25E44B', justify='center')
 
     # if description is empty
-    if task.description == "":
-        task.description = 'N\A'
+    if description == "":
+        description = 'N\A'
 
     # If checklist is empty
-    if task.checklist == [] or task.checklist == ['']:
+    if len(task.checklist) == 0 or task.checklist.names == ('',):
         checklist_table.add_row('N\A', 'N\A', 'N\A')
 
     else:
         counter = 1
         
         # Sort checklist items based on whether or not they're completed
-        task.checklist.sort(key=lambda item: item[-1])
-        
-        for item in task.checklist:
+        for item in sorted(task.checklist, key=lambda item: item.done):
             if checks.check_checklist_completion(item):
-                name = f"[s]{item[:-1]}[/]"
+                name = f"[s]{item.name}[/]"
                 status = 'Completed'
 
             else:
-                name = item[:-1]
+                name = item.name
                 status = 'Not completed'
 
             checklist_table.add_row(str(counter), name, status)
             counter += 1
 
+    # Importing rich.markdown takes longer than most commands, only print_task needs it
+    from rich.markdown import Markdown
+
     task_heading = Markdown('# Task')
     description_heading = Markdown("## Description")
     checklist_heading = Markdown('## Checklist')
@@ -169,7 +239,7 @@ def print_task(task: Task):
 
     center_print(description_heading)
     print()
-    center_print(task.description, style=CONFIGS['TASK_DESCRIPTION_COLOR'])
+    center_print(description, style=CONFIGS.style('TASK_DESCRIPTION_COLOR'))
 
     print('\n')
 
@@ -179,127 +249,173 @@ def print_task(task: Task):
     print()
 
     # Printing the progress bar for the checklist
-    total = task.num_done + task.num_undone
+    total = task.num_items
     print_progress_bar(total=total, num_completed=task.num_done)
 
     print('\n')
 
-def add_tasks_to_table(ls: List, table: Table, with_description: bool, ranks_of_tasks: list, show_completed_only: bool, show_undone_only: bool):
-    CONFIGS = get_config(CONFIGPATH)
-    all_tasks = fileutils.get_tasks()
+def should_show_task(task: Task, show_completed_only: bool, show_undone_only: bool) -> bool:
+    """
+    if show_completed_only is true only completed tasks are shown
+    if show_undone_only is true only non completed tasks are shown
+    if none are true then every task is shown
+    """
+    return ((show_completed_only and task.completed) or (show_undone_only and not task.completed)) or (not show_completed_only and not show_undone_only)
 
-    # Sort tasks based on importance
-    all_tasks.sort(key=lambda task: task.importance, reverse=True)
+def get_shown_tasks(ls: List, show_completed_only: bool, show_undone_only: bool, window: tuple = None):
+    """
+    Yields the tasks of a list that are shown, sorted based on importance.
+    window is (offset, limit), only the tasks in it are given. limit can be None
+    """
+    tasks = (task for task in get_tasks_in_list(ls) if should_show_task(task, show_completed_only, show_undone_only))
 
-    if with_description:
+    if window is not None:
+        offset, limit = window
+        tasks = islice(tasks, offset, None if limit is None else offset + limit)
 
-        table.add_column('Description', header_style=CONFIGS['TASK_DESCRIPTION_COLOR'], style=CONFIGS['TASK_DESCRIPTION_COLOR'], justify='center')
-        
-        for task in all_tasks:
-
-            if task.id in ls.task_ids:
-                
-                rank = str(ranks_of_tasks.pop(0)[1])
-
-                # This condition basically just checks if the task can be printed or not
-                # if show_completed_only is true only print completed tasks
-                # if show_undone_only is true only print non completed tasks
-                # if none are true then just print the task
-                if ((show_completed_only and task.completed) or (show_undone_only and not task.completed)) or (not show_completed_only and not show_undone_only):
-
-                    name = format_task_name(task)
-
-                    # If description is empty
-                    if task.description == "":
-                        task.description = 'N\A'
-
-                    if task.completed:
-                        status = 'Completed'
-                        style = CONFIGS['TASK_DONE_COLOR']
-                    else:
-                        status = 'Not completed'
-                        style = CONFIGS[f'TASK_IMPORTANCE_{task.importance}_COLOR']
-
-                    table.add_row(
-                        rank,
-                        name,
-                        str(task.importance),
-                        status,
-                        task.description,
-                        style=style
-                    )
+    return tasks
 
-    else:
-        for task in all_tasks:
-
-            if task.id in ls.task_ids:
-
-                rank = str(ranks_of_tasks.pop(0)[1])
-                
-                if ((show_completed_only and task.completed) or (show_undone_only and not task.completed)) or (not show_completed_only and not show_undone_only):
-                    name = format_task_name(task)
-                        
-                    if task.completed:
-                        status = 'Completed'
-                        style = CONFIGS['TASK_DONE_COLOR']
-                    else:
-                        status = 'Not completed'
-                        style = CONFIGS[f'TASK_IMPORTANCE_{task.importance}_COLOR']
-
-                    table.add_row(
-                        rank,
-                        name,
-                        str(task.importance),
-                        status,
-                        style=style
-                    )
+def get_task_rows(ls: List, rank_map: RankMap, with_description: bool, show_completed_only: bool, show_undone_only: bool, window: tuple = None):
+    """
+    Yields the cells and the style of the row of every task in the list that is shown
+    """
+    CONFIGS = load_config(CONFIGPATH)
+
+    for task in get_shown_tasks(ls, show_completed_only, show_undone_only, window):
+        rank = str(rank_map.get_rank(task.id))
+        name = format_task_name(task)
+
+        if task.completed:
+            status = 'Completed'
+            style = CONFIGS.style('TASK_DONE_COLOR')
+        else:
+            status = 'Not completed'
+            style = CONFIGS.style(f'TASK_IMPORTANCE_{task.importance}_COLOR')
+
+        if with_description:
+            # If description is empty
+            description = task.description
+
+            if description == "":
+                description = 'N\A'
+
+            yield (rank, name, str(task.importance), status, description), style
+
+        else:
+            yield (rank, name, str(task.importance), status), style
+
+def make_tasks_table(with_description: bool, show_header: bool = True, widths: list = None) -> Table:
+    """
+    The table the tasks of a list are printed in.
+    Every column is given the width in widths if it's given instead of fitting its cells
+    """
+    CONFIGS = load_config(CONFIGPATH)
+
+    if widths is None:
+        widths = [None] * 5
+
+    table = Table(show_header=show_header, show_edge=False, show_footer=False, show_lines=False, box=box.SIMPLE_HEAD)
+
+    table.add_column('ID', header_style=CONFIGS.style('TASK_ID_COLOR'), style=CONFIGS.style('TASK_ID_COLOR'), justify='center', width=widths[0])
+    table.add_column('Name', header_style=CONFIGS.style('TASK_NAME_COLOR'), style=CONFIGS.style('TASK_NAME_COLOR'), justify='center', width=widths[1])
+    table.add_column('Imp', header_style=CONFIGS.style('IMPORTANCE_HEADER_COLOR'), justify='center', width=widths[2])
+    table.add_column('Status', justify='center', width=widths[3])
+
+    if with_description:
+        table.add_column('Description', header_style=CONFIGS.style('TASK_DESCRIPTION_COLOR'), style=CONFIGS.style('TASK_DESCRIPTION_COLOR'), justify='center', width=widths[4])
 
     return table
 
+def get_cell_width(cell: str) -> int:
+    """
+    How wide rich makes a cell, names and descriptions can have markup in them
+    """
+    if '[' in cell or ':' in cell:
+        return console.render_str(cell).cell_len
+
+    return cell_len(cell)
+
+def print_tasks_table(rows, with_description: bool) -> None:
+    """
+    Prints the rows made by get_task_rows, which are only gone through once.
+
+    Lists with more than ROWS_PER_CHUNK rows are printed that many rows at a time so that the
+    first ones appear before the rest are made and they're never held in a single table.
+    The columns start as wide as the widest cells of the first chunk and only get wider when a
+    later chunk has a wider cell, so chunks line up unless something further down is wider
+    """
+    rows = iter(rows)
+    chunk = list(islice(rows, ROWS_PER_CHUNK + 1))
+
+    if len(chunk) <= ROWS_PER_CHUNK:
+        table = make_tasks_table(with_description)
+
+        for cells, style in chunk:
+            table.add_row(*cells, style=style)
+
+        center_print(table)
+        return
+
+    widths = [cell_len(header) for header in ['ID', 'Name', 'Imp', 'Status', 'Description']]
+    show_header = True
+
+    while chunk:
+        for cells, _ in chunk:
+            for index, cell in enumerate(cells):
+                widths[index] = max(widths[index], get_cell_width(cell))
+
+        table = make_tasks_table(with_description, show_header=show_header, widths=widths)
+
+        for cells, style in chunk:
+            table.add_row(*cells, style=style)
+
+        center_print(table)
+
+        show_header = False
+        chunk = list(islice(rows, ROWS_PER_CHUNK))
+
 def count_completed_tasks(ls: List):
     """
     Counts completed tasks in a list
     """
-    all_tasks = fileutils.get_tasks()
+    store = fileutils.store
     count = 0
 
-    # TODO: change this to use get_parent_list
-    for task in all_tasks:
-        if task.id in ls.task_ids:
-            if task.completed:
-                count += 1
+    for task_id in ls.task_ids:
+        task = store.get_task(task_id)
+
+        if task is not None and task.completed:
+            count += 1
 
     return count
 
 def print_progress_bar(total: int, num_completed: int) -> None:
-    with CenteredProgress(
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        MofNCompleteColumn()
-    ) as progress:
-        progress.add_task(description="[italic #96FF4B]Progress[/italic #96FF4B]", total=total, completed=num_completed)
+    console.print(make_progress_bar(total, num_completed))
 
-def print_list(ls: List, ls_rank: int, ranks_of_tasks: list, show_completed_only: bool, show_undone_only: bool, with_description: bool = False):
+def print_list(ls: List, rank_map: RankMap, show_completed_only: bool, show_undone_only: bool, with_description: bool = False, window: tuple = None):
+    """
+    window is (offset, limit) to only print some of the tasks, see get_task_rows
+    """
+    CONFIGS = load_config(CONFIGPATH)
 
-    CONFIGS = get_config(CONFIGPATH)
+    ls_rank = rank_map.get_rank(ls.id)
 
     title = f"\n[bold {CONFIGS['LIST_ID_COLOR']}]ID: {ls_rank}[/] |[bold {CONFIGS['LIST_NAME_COLOR']}] {ls.name}[/]\n"
-    
-    table = Table(show_header=True, show_edge=False, show_footer=False, show_lines=False, box=box.SIMPLE_HEAD)
 
-    table.add_column('ID', header_style=CONFIGS['TASK_ID_COLOR'], style=CONFIGS['TASK_ID_COLOR'], justify='center')
-    table.add_column('Name', header_style=CONFIGS['TASK_NAME_COLOR'], style=CONFIGS['TASK_NAME_COLOR'], justify='center')
-    table.add_column('Imp', header_style=CONFIGS['IMPORTANCE_HEADER_COLOR'], justify='center')
-    table.add_column('Status', justify='center')
+    center_print(title)
     
-    if ls.task_ids == []:
+    if len(ls.task_ids) == 0:
         # If the list is empty
+        table = make_tasks_table(with_description=False)
         table.add_row('N\A', 'N\A', 'N\A', 'N\A')
+
+        center_print(table)
+
     else:
-        table = add_tasks_to_table(ls, table, with_description, ranks_of_tasks, show_completed_only, show_undone_only)
+        print_tasks_table(get_task_rows(ls, rank_map, with_description, show_completed_only, show_undone_only, window), with_description)
 
-    center_print(title)
-    center_print(table)
+        if window is not None:
+            print_window_position(ls, window, show_completed_only, show_undone_only)
     
     print()
 
@@ -307,8 +423,30 @@ def print_list(ls: List, ls_rank: int, ranks_of_tasks: list, show_completed_only
 
     print()
 
+def print_window_position(ls: List, window: tuple, show_completed_only: bool, show_undone_only: bool) -> None:
+    """
+    Prints which of the tasks of a list were printed when only some of them were
+    """
+    store = fileutils.store
+    offset, limit = window
+
+    total = 0
+
+    for task_id in ls.task_ids:
+        task = store.get_task(task_id)
+
+        if task is not None and should_show_task(task, show_completed_only, show_undone_only):
+            total += 1
+
+    end = total if limit is None else min(total, offset + limit)
+
+    if offset >= total:
+        center_print(f"[dim]No tasks past {total}[/dim]")
+    else:
+        center_print(f"[dim]Tasks {offset + 1}-{end} of {total}[/dim]")
+
 def print_workspace(ws: Workspace, rank: int):
-    CONFIGS = get_config(CONFIGPATH)
+    CONFIGS = load_config(CONFIGPATH)
     
     # TODO: change this to use ranks later
     title_id = f"[bold {CONFIGS['WORKSPACE_ID_COLOR']}]ID: {rank}[/]"
@@ -317,13 +455,12 @@ def print_workspace(ws: Workspace, rank: int):
     center_print(title_id)
     center_print(title_name)
 
-def print_all_workspaces(ws_ranks: list):
+def print_all_workspaces(rank_map: RankMap):
     all_workspaces = fileutils.get_workspaces()
-    CONFIGS = get_config(CONFIGPATH)
+    CONFIGS = load_config(CONFIGPATH)
     
     for ws in all_workspaces:
-        # TODO: change this to use ranks later
-        rank = ws_ranks.pop(0)[1]
+        rank = rank_map.get_rank(ws.id)
         text = f"[bold {CONFIGS['WORKSPACE_ID_COLOR']}]ID: {rank}[/] | [bold {CONFIGS['WORKSPACE_NAME_COLOR']}]{ws.name}[/]"
         
         print()
@@ -332,61 +469,94 @@ def print_all_workspaces(ws_ranks: list):
         
     print()
 
-def get_tasks_in_list(ls: List):
+def write_task(writer: 'RecordWriter', task: Task, rank_map: RankMap) -> None:
+    from td.utils.jsonutils import task_record
+
+    writer.write(task_record(task, rank_map.get_rank(task.id), get_parent_list(task).id))
+
+def write_list(writer: 'RecordWriter', ls: List, rank_map: RankMap, show_completed_only: bool, show_undone_only: bool, window: tuple = None) -> None:
     """
-    Gets all the tasks that belong to a list
+    Writes the list and then the tasks print_list would print
     """
-    all_tasks = fileutils.get_tasks()
+    from td.utils.jsonutils import list_record, task_record
 
-    tasks_in_list = []
+    ws = get_parent_workspace(ls)
+    writer.write(list_record(ls, rank_map.get_rank(ls.id), ws.id if ws is not None else None))
 
-    for task_id in ls.task_ids:
-        for task in all_tasks:
-            if task.id == int(task_id):
-                tasks_in_list.append(task)
-                all_tasks.remove(task)
+    for task in get_shown_tasks(ls, show_completed_only, show_undone_only, window):
+        writer.write(task_record(task, rank_map.get_rank(task.id), ls.id))
 
-    # Sort based on importance
-    tasks_in_list.sort(key=lambda task: task.importance, reverse=True)
+def write_workspace(writer: 'RecordWriter', ws: Workspace, rank_map: RankMap, show_completed_only: bool, show_undone_only: bool, window: tuple = None) -> None:
+    from td.utils.jsonutils import workspace_record
 
-    return tasks_in_list
+    writer.write(workspace_record(ws, rank_map.get_rank(ws.id)))
 
-def get_lists_in_workspace(ws: Workspace) -> list:
-    all_lists = fileutils.get_lists()
+    for ls in get_lists_in_workspace(ws):
+        write_list(writer, ls, rank_map, show_completed_only, show_undone_only, window)
 
-    lists_in_workspace = []
+def write_all_workspaces(writer: 'RecordWriter', rank_map: RankMap) -> None:
+    from td.utils.jsonutils import workspace_record
 
-    for list_id in ws.list_ids:
-        for ls in all_lists:
-            if ls.id == list_id:
-                lists_in_workspace.append(ls)
-                all_lists.remove(ls)
+    for ws in fileutils.get_workspaces():
+        writer.write(workspace_record(ws, rank_map.get_rank(ws.id)))
 
-    return lists_in_workspace
+def get_tasks_in_list(ls: List):
+    """
+    Gets all the tasks that belong to a list sorted based on importance
+    """
+    return tasks_in_list(fileutils.store, ls)
+
+def get_lists_in_workspace(ws: Workspace) -> list:
+    return lists_in_workspace(fileutils.store, ws)
 
 # TODO: remove this when I add ranks to workspaces
 def get_workspace_from_id(ws_id: int):
-    all_workspaces = fileutils.get_workspaces()
-
-    for ws in all_workspaces:
-        if ws.id == ws_id:
-            return ws
-    return None
+    return fileutils.store.get_workspace(ws_id)
 
-def generate_ranks(objects: list, unused_ranks: list) -> list:
+def get_rank_map(ws: Workspace = None) -> RankMap:
+    """
+    Returns the ranks of everything in ws, or of the workspaces in the main menu if ws is None.
+    The map is built once and reused until the store changes.
+    If nothing was written since show last printed the ranks they are read back instead
     """
-    objects is a list of either lists or tasks to get ranks of.
-    objects is expected to be sorted.
-    returns a list of tuples -> [(object_id, object_rank)]
+    store = fileutils.store
+    key = None if ws is None else ws.id
+
+    if key not in store.rank_maps:
+        rank_map = fileutils.read_rank_snapshot(ws)
+
+        if rank_map is None:
+            rank_map = RankMap(store, ws)
+
+        store.rank_maps[key] = rank_map
+
+    return store.rank_maps[key]
 
-    unused_ranks is the list of ranks which are going to be assigned to 
-    the objects in order
+@contextmanager
+def frozen_ranks():
     """
-    ranks = []
-    for obj in objects:
-        ranks.append((obj.id, unused_ranks.pop(0)))
-    
-    return ranks
+    Inside the block ranks are resolved against the ranks everything had when it started,
+    even after things are added, moved or deleted. Used by td batch.
+    Workspaces added inside the block get their ranks the first time they're used
+    """
+    global frozen_rank_maps
+
+    frozen_rank_maps = {None: get_rank_map()}
+
+    for ws in fileutils.get_workspaces():
+        frozen_rank_maps[ws.id] = get_rank_map(ws)
+
+    # Otherwise a deleted id could be given to something added later
+    # and the rank it had would point at that instead
+    ids = fileutils.store.ids
+    ids.hold()
+
+    try:
+        yield
+
+    finally:
+        frozen_rank_maps = None
+        ids.let_go()
 
 def get_object_from_rank(rank: int):
     rank = int(rank)
@@ -394,127 +564,49 @@ def get_object_from_rank(rank: int):
     c_ws_id = fileutils.get_current_workspace_id()
     c_ws = get_workspace_from_id(c_ws_id)
 
-    if c_ws is None:
-        all_workspaces = fileutils.get_workspaces()
-        
-        unused_ranks = list(range(1, len(all_workspaces)+1))
-        ws_ranks = generate_ranks(all_workspaces, unused_ranks)
-
-        for ws_rank in ws_ranks:
-            if rank == ws_rank[1]:
-                for ws in all_workspaces:
-                    if ws.id == ws_rank[0]:
-                        return ws
-        
-        raise typer.BadParameter(f"The ID '{rank}' doesn't exist!")
+    rank_map = None
 
-    if rank == 1:
-        return c_ws
+    if frozen_rank_maps is not None:
+        rank_map = frozen_rank_maps.get(None if c_ws is None else c_ws.id)
 
-    all_tasks = fileutils.get_tasks()
-    all_tasks.sort(key=lambda task: task.importance, reverse=True)
+    if rank_map is None:
+        rank_map = get_rank_map(c_ws)
 
-    ws_list_ranks = get_ranks_of_lists_in_workspace(c_ws)
-    lists = get_lists_in_workspace(c_ws)
+    object_id = rank_map.get_id(rank)
 
-    # Check to see if the rank is a list
-    for list_rank in ws_list_ranks[1:]:
-        if list_rank[1] == rank:
-            for ls in lists:
-                if ls.id == list_rank[0]:
-                    return ls
-
-    # Holds the ranks of all tasks
-    all_task_ranks = []
-
-    for ls in lists:
-        used_ranks = ws_list_ranks + all_task_ranks
-        task_ranks = get_ranks_of_tasks_in_list(c_ws, ls, used_ranks)
+    if object_id is None:
+        raise typer.BadParameter(f"The ID '{rank}' doesn't exist!")
 
-        all_task_ranks += task_ranks
+    obj = fileutils.store.locate(object_id)[1]
 
-    for task_rank in all_task_ranks:
-        if task_rank[1] == rank:
-            for task in all_tasks:
-                if task.id == task_rank[0]:
-                    return task
+    if obj is None:
+        # Only possible with frozen ranks
+        raise typer.BadParameter(f"The ID '{rank}' doesn't exist anymore!")
 
-    raise typer.BadParameter(f"The ID '{rank}' doesn't exist!")
+    return obj
 
 def generate_id():
-    all_ids = fileutils.get_all_ids()
-    try:
-        for num in range(1,int(all_ids[-1])+1):
-            if num not in all_ids:
-                return num
-            
-    except IndexError:
-        return 1
-    
-    return int(all_ids[-1])+1
+    return fileutils.generate_id()
 
 def format_task_name(task: Task):
         if task.completed:
-            return f"[s]{task.name[:-1]}[/]"
+            return f"[s]{task.name}[/]"
         
-        return task.name[:-1]
+        return task.name
 
 def get_ranks_of_lists_in_workspace(ws: Workspace) -> list:
     """
     Takes in a workspace and returns the ranks of every list in that workspace.
     rank 1 is always assigned to the workspace given and the list that this function
     returns includes that rank
-
-    """
-
-    lists = get_lists_in_workspace(ws)
-
-    # The objects to be given to generate_ranks
-    objects = [ws]
-
-    for ls in lists:
-        objects.append(ls)
-
-    unused_ranks = list(range(1, len(objects)+1))
-    
-    checks.check_unused_ranks(unused_ranks, len(objects))
-    
-    return generate_ranks(objects, unused_ranks) # list_ranks
-
-def get_rank_of_list(ws: Workspace, ls: List) -> tuple:
-    """
-    Takes in a workspace and a list which is inside that workspace.
-    Returns the rank of that list
     """
-    list_ranks = get_ranks_of_lists_in_workspace(ws)
-
-    for list_rank in list_ranks:
-        if list_rank[0] == ls.id:
-            return list_ranks
-
-def get_ranks_of_tasks_in_list(ws: Workspace, ls: List, used_ranks: list) -> list:
-    """
-    Takes in a workspace and a list.
-    Generates ranks of only the tasks in a list.
-    used_ranks is a list of ranks that have already been used. 
-    This function starts off at the end of used_ranks. 
-    used_ranks is expected to be sorted.
-    """
-    tasks = get_tasks_in_list(ls)
-    unused_ranks = list(range((used_ranks[-1][1])+1, ((used_ranks[-1][1])+len(tasks))+1))
-
-    return generate_ranks(tasks, unused_ranks)
+    return get_rank_map(ws).get_ranks([ws.id, *ws.list_ids])
 
 def get_rank_of_task(task: Task):
     c_ws_id = fileutils.get_current_workspace_id()
     c_ws = get_workspace_from_id(c_ws_id)
 
-    # TODO: Maybe update this later to be faster
-    task_ranks = get_ranks_of_tasks_in_workspace(c_ws)
-            
-    for task_rank in task_ranks:
-        if task.id == task_rank[0]:
-            return task_rank
+    return (task.id, get_rank_map(c_ws).get_rank(task.id))
 
 def get_tasks_in_workspace(ws:Workspace) -> list:
     lists = get_lists_in_workspace(ws)
@@ -532,51 +624,19 @@ def get_rank_from_task_id(task_id: int, c_ws: Workspace) -> int:
     """
     Returns only the rank
     """
-    task_ranks = get_ranks_of_tasks_in_workspace(c_ws)
-
-    for task_rank in task_ranks:
-        if task_rank[0] == task_id:
-            return task_rank[1]
+    return get_rank_map(c_ws).get_rank(task_id)
         
 def get_rank_from_list_id(ls_id: int, c_ws: Workspace) -> int:
     """
     Returns only the rank
     """
-
-    list_ranks = get_ranks_of_lists_in_workspace(c_ws)
-
-    for ls_rank in list_ranks:
-        if ls_rank[0] == ls_id:
-            return ls_rank[1]
+    return get_rank_map(c_ws).get_rank(ls_id)
             
 def get_ranks_of_tasks_in_workspace(ws: Workspace) -> list:
     """
     Gets ranks of all tasks in a workspace in a tuple
     """
-
-    tasks = get_tasks_in_workspace(ws)
-
-    list_ranks = get_ranks_of_lists_in_workspace(ws)
-    
-    formatted_list_ranks = [list_rank[1] for list_rank in list_ranks]
-    formatted_list_ranks.sort()
-
-    first_rank = formatted_list_ranks[-1]+1 # Add one to the greatest rank
-    last_rank = formatted_list_ranks[-1] + len(tasks) + 1
-
-    unused_ranks = list(range(first_rank, last_rank))
-
-    task_ranks = generate_ranks(tasks, unused_ranks)
-
-    return task_ranks
+    return get_rank_map(ws).get_ranks(task.id for task in get_tasks_in_workspace(ws))
 
 def get_rank_of_workspace_from_id(ws_id: int) -> int:
-    objects = fileutils.get_workspaces()
-
-    unused_ranks = list(range(1, len(objects)+1))
-
-    ws_ranks = generate_ranks(objects, unused_ranks)
-
-    for ws_rank in ws_ranks:
-        if ws_rank[0] == ws_id:
-            return ws_rank[1]
+    return get_rank_map().get_rank(ws_id)
@@ -0,0 +1,87 @@
+"""
+What deleting tasks, lists and workspaces takes with it.
+Everything under the objects being deleted is collected in one traversal of the store
+so that it can be removed in one go, or only reported by td del --dry-run
+"""
+from td.utils.tasks import Task
+from td.utils.lists import List
+from td.utils.workspaces import Workspace
+
+class Cascade:
+    """
+    The ids of every task, list and workspace that goes when roots are deleted
+    and the lists and workspaces roots have to be taken out of.
+    A root that's under another root is only collected once
+    """
+
+    def __init__(self, store, roots):
+        self.store = store
+
+        self.task_ids = []
+        self.list_ids = []
+        self.workspace_ids = []
+        self.num_items = 0
+
+        # Id of a list or workspace that stays -> ids of the roots taken out of it
+        self.detached = {}
+
+        self._seen = set()
+
+        for obj in roots:
+            if isinstance(obj, Workspace):
+                self._add_workspace(obj)
+
+            elif isinstance(obj, List):
+                self._add_list(obj)
+                self._detach(store.list_parents.get(obj.id), obj.id)
+
+            elif isinstance(obj, Task):
+                self._add_task(obj)
+                self._detach(store.task_parents.get(obj.id), obj.id)
+
+        # Parents that are deleted as well don't have to be changed
+        self.detached = {
+            parent_id: child_ids for parent_id, child_ids in self.detached.items() if parent_id not in self._seen
+        }
+
+    def _detach(self, parent_id: int, object_id: int) -> None:
+        if parent_id is not None:
+            self.detached.setdefault(parent_id, set()).add(object_id)
+
+    def _add_workspace(self, ws: Workspace) -> None:
+        if ws.id in self._seen:
+            return
+
+        self._seen.add(ws.id)
+        self.workspace_ids.append(ws.id)
+
+        for list_id in ws.list_ids:
+            ls = self.store.get_list(list_id)
+
+            if ls is not None:
+                self._add_list(ls)
+
+    def _add_list(self, ls: List) -> None:
+        if ls.id in self._seen:
+            return
+
+        self._seen.add(ls.id)
+        self.list_ids.append(ls.id)
+
+        for task_id in ls.task_ids:
+            task = self.store.get_task(task_id)
+
+            if task is not None:
+                self._add_task(task)
+
+    def _add_task(self, task: Task) -> None:
+        if task.id in self._seen:
+            return
+
+        self._seen.add(task.id)
+        self.task_ids.append(task.id)
+
+        self.num_items += sum(1 for name in task.checklist.names if name != '')
+
+    def __repr__(self):
+        return f"Cascade(tasks={len(self.task_ids)}, lists={len(self.list_ids)}, workspaces={len(self.workspace_ids)})"
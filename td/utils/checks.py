@@ -1,18 +1,22 @@
 import typer
-import os
 from rich import print as rprint
 from rich.prompt import Confirm
 from td.utils.fileutils import Fileutils
-from td.utils.tasks import Task
+from td.utils.tasks import Task, ChecklistItem
 from td.utils.lists import List
 from td.utils.workspaces import Workspace
 
 class Checks:
     
-    def __init__(self, PATH: str, CONFIGPATH: str):
+    def __init__(self, PATH: str, CONFIGPATH: str, fileutils: Fileutils = None):
         self.PATH = PATH
         self.CONFIGPATH = CONFIGPATH
-        self.fileutils = Fileutils(self.PATH, self.CONFIGPATH)
+
+        # Share the caller's Fileutils so that td.txt is only parsed once
+        if fileutils is None:
+            fileutils = Fileutils(self.PATH, self.CONFIGPATH)
+
+        self.fileutils = fileutils
 
     def check_type(self, typ: str):
         if typ.lower() not in ['workspace', 'list', 'task', 'checklist', 'ws', 'ls', 't', 'cs']:
@@ -20,10 +24,8 @@ class Checks:
         return typ.lower()
 
     def check_id(self, object_id: int):
-        all_ids = self.fileutils.get_all_ids()
-        
         if object_id != None:
-            if object_id not in all_ids: # Change this later
+            if self.fileutils.store.kind_of(object_id) is None:
                 raise typer.BadParameter(f"The ID '{object_id}' doesn't exist!")
         return object_id
 
@@ -46,26 +48,22 @@ class Checks:
 
     def check_checklist(self, task_id: int, item_name: str):
         #TODO: try changing this to get_tasks_in_current_workspace
-        all_tasks = self.fileutils.get_tasks()
-        for task in all_tasks:
-            if task_id == task.id:
-                task.name = task.name[:-1]
-
-                if item_name.isdigit():
-                    if len(task.checklist) == 1 and '' in task.checklist:
-                        raise typer.BadParameter(f"An item of rank {item_name} is not a part of the checklist in {task.name}")
-                    elif int(item_name) not in range(1, len(task.checklist)+1):
-                        raise typer.BadParameter(f"An item of rank {item_name} is not a part of the checklist in {task.name}")
-                else:
-                    if item_name not in self._remove_last_char_in_item(task.checklist):
-                        raise typer.BadParameter(f"The item '{item_name}' is not a part of the checklist in {task.name}")
-                
-                break
+        task = self.fileutils.store.get_task(task_id)
 
-    def check_checklist_completion(self, item: str) -> bool:
-        if item[-1] == '0':
-            return False
-        return True
+        if task is not None:
+            task_name = task.name
+
+            if item_name.isdigit():
+                if task.checklist.names == ('',):
+                    raise typer.BadParameter(f"An item of rank {item_name} is not a part of the checklist in {task_name}")
+                elif int(item_name) not in range(1, len(task.checklist)+1):
+                    raise typer.BadParameter(f"An item of rank {item_name} is not a part of the checklist in {task_name}")
+            else:
+                if item_name not in task.checklist.names:
+                    raise typer.BadParameter(f"The item '{item_name}' is not a part of the checklist in {task_name}")
+
+    def check_checklist_completion(self, item: ChecklistItem) -> bool:
+        return item.done
     
     def check_count_type(self, typ: str) -> bool:
         if typ not in ['done', 'undone', 'd', 'u', 'completed', 'uncompleted']:
@@ -78,7 +76,7 @@ class Checks:
         If no list is available add a default list
         """
         
-        if c_ws.list_ids == []:
+        if len(c_ws.list_ids) == 0:
 
             new_id = self._generate_id()
             default_list = List(new_id, 'To Do')
@@ -113,27 +111,21 @@ class Checks:
         """
         Checks if an id belongs to a task
         """
-        task_ids = self.fileutils.get_task_ids()
-
-        if object_id not in task_ids:
+        if self.fileutils.store.kind_of(object_id) != 'TASK':
             raise typer.BadParameter("ID given doesn't belong to a task!")
 
     def check_list_id(self, object_id: int):
         """
         Check if the id given belongs to a list
         """
-        list_ids = self.fileutils.get_list_ids()
-
-        if object_id not in list_ids:
+        if self.fileutils.store.kind_of(object_id) != 'LIST':
             raise typer.BadParameter("ID given doesn't belong to a list!")
         
     def check_workspace_id(self, object_id: int):
         """
         Check if the given id belongs to a workspace
         """
-        ws_ids = self.fileutils.get_workspace_ids()
-
-        if object_id not in ws_ids:
+        if self.fileutils.store.kind_of(object_id) != 'WORKSPACE':
             raise typer.BadParameter("ID given doesn't belong to a workspace!")
     
         return object_id
@@ -174,41 +166,21 @@ class Checks:
             raise typer.BadParameter("You can't use that command since you're in the main menu!")
     
     def check_file(self):
-        with open(self.PATH) as f:
-            lines = f.readlines()
-
-            if ('[TASKS]\n' not in lines or '[LISTS]\n' not in lines) or '[WORKSPACES]\n' not in lines:
-                rprint(f"[bold red]{self.PATH} has been modified![/bold red]")
+        if not self.fileutils.check_format():
+            rprint(f"[bold red]{self.PATH} has been modified![/bold red]")
+            
+            if Confirm.ask(f"Do you want to create a new instance of {self.PATH}? [bold red]This will result in all your workspaces being deleted[/bold red]"):
+                # PATH and everything kept next to it is deleted so that the program can have a fresh start and be usable
+                self.fileutils.remove_files()
                 
-                if Confirm.ask(f"Do you want to create a new instance of {self.PATH}? [bold red]This will result in all your workspaces being deleted[/bold red]"):
-                    # PATH is deleted so that the program can have a fresh start and be usable
-                    os.remove(self.PATH)
-                    
-                    quit()
-
-                else:
-                    print("Exiting program")
-                    quit()
+                quit()
+
+            else:
+                print("Exiting program")
+                quit()
     
     def _generate_id(self) -> int:
-        all_ids = self.fileutils.get_all_ids()
-        try:
-            for num in range(1,int(all_ids[-1])+1):
-                if num not in all_ids:
-                    return num
-                
-        except IndexError:
-            return 1
-        
-        return int(all_ids[-1])+1
-
-    def _remove_last_char_in_item(self, checklist: list) -> list:
-        new_list = []
-        for item in checklist:
-            new_list.append(item[:-1])
-
-
-        return new_list
+        return self.fileutils.generate_id()
     
     def _check_hex(self, value: str) -> bool:
         
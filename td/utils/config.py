@@ -3,6 +3,8 @@ This script provides functions that get the set configuration and it also sets d
 """
 from rich import print as rprint
 from rich.prompt import Confirm
+from rich.style import Style
+import os
 
 DEFAULT_CONFIGS = {
     "TASK_ID_COLOR": "#EEFF54",
@@ -19,7 +21,53 @@ DEFAULT_CONFIGS = {
     "WORKSPACE_NAME_COLOR": "#6876F8"
 }
 
+class Config:
+    """
+    The configurations in config.txt, with a rich Style made from each of them once
+    so that it doesn't have to be parsed again for every cell that uses it.
+    CONFIGS['TASK_ID_COLOR'] gives the value like get_config does
+    """
+    __slots__ = ('values', 'styles')
+
+    def __init__(self, values: dict) -> None:
+        self.values = values
+        self.styles = {config_name: Style.parse(value) for config_name, value in values.items()}
+
+    def style(self, config_name: str) -> Style:
+        return self.styles[config_name]
+
+    def __getitem__(self, config_name: str) -> str:
+        return self.values[config_name]
+
+    def __repr__(self):
+        return f"Config({self.values})"
+
+# Path of a config file -> (its mtime and size, Config)
+_loaded_configs = {}
+
+def load_config(CONFIGPATH: str) -> Config:
+    """
+    Same as get_config but config.txt is only read again once it has changed
+    """
+    stat = os.stat(CONFIGPATH)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+
+    loaded = _loaded_configs.get(CONFIGPATH)
+
+    if loaded is not None and loaded[0] == stamp:
+        return loaded[1]
+
+    config = Config(get_config(CONFIGPATH))
+
+    # get_config rewrites the file if it had to go back to the defaults
+    stat = os.stat(CONFIGPATH)
+    _loaded_configs[CONFIGPATH] = ((stat.st_mtime_ns, stat.st_size), config)
+
+    return config
+
 def set_default_config(CONFIGPATH):
+    _loaded_configs.pop(CONFIGPATH, None)
+
     with open(CONFIGPATH, mode='w') as f:
         f.write(f"TASK_ID_COLOR={DEFAULT_CONFIGS['TASK_ID_COLOR']}\n")
         f.write(f"TASK_NAME_COLOR={DEFAULT_CONFIGS['TASK_NAME_COLOR']}\n")
@@ -75,6 +123,8 @@ def get_config(CONFIGPATH: str):
     return formatted_configs
 
 def edit_config_value(CONFIGPATH:str, config_to_edit: str, new_value: str):
+    # Changing a colour keeps the size of the file and could keep its mtime too
+    _loaded_configs.pop(CONFIGPATH, None)
     
     with open(CONFIGPATH, mode='r') as f:
         lines = f.readlines()
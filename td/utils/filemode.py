@@ -0,0 +1,23 @@
+"""
+td.txt and the files next to it are replaced by writing a temporary file and renaming it over them.
+mkstemp always makes that file private (0600), so it's given the mode the file it replaces had
+"""
+import stat
+import os
+
+def match_mode(fd: int, path: str) -> None:
+    """
+    Gives the file open as fd the mode of path,
+    or the mode a new file gets from the umask if path doesn't exist yet
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+
+    except FileNotFoundError:
+        # The umask can only be read by setting it
+        umask = os.umask(0)
+        os.umask(umask)
+
+        mode = 0o666 & ~umask
+
+    os.fchmod(fd, mode)
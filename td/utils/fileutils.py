@@ -1,12 +1,19 @@
 from td.utils.tasks import Task
 from td.utils.lists import List
 from td.utils.workspaces import Workspace
+from td.utils.store import Store
+from td.utils.ranks import RankMap
+from td.utils.cascade import Cascade
+from td.utils.storecache import StoreCache
+from td.utils.filemode import match_mode
 from td.utils.config import set_default_config
+from contextlib import contextmanager
+import tempfile
 import os
 
 class Fileutils:
 
-    def __init__(self, PATH: str, CONFIGPATH: str):
+    def __init__(self, PATH: str, CONFIGPATH: str, journal: bool = False):
         self.ID_INDEX = 0
         self.NAME_INDEX = 1
         self.IMPORTANCE_INDEX = 2
@@ -22,6 +29,36 @@ class Fileutils:
 
         self.PATH = PATH
         self.CONFIGPATH = CONFIGPATH
+
+        # In journal mode changes are appended to JOURNAL_PATH instead of rewriting td.txt.
+        # The journal is folded back into td.txt once it grows past JOURNAL_COMPACT_SIZE bytes
+        self.journal = journal
+        self.JOURNAL_PATH = PATH + '.journal'
+        self.JOURNAL_COMPACT_SIZE = 256 * 1024
+        self.JOURNAL_OPS = {Task: 'TASK', List: 'LIST', Workspace: 'WORKSPACE'}
+
+        # The ranks last printed by show, stamped with the version of td.txt they were worked out from
+        self.RANKS_PATH = PATH + '.ranks'
+
+        # The current workspace is kept here instead of in the first line of td.txt
+        # so switching workspaces doesn't rewrite td.txt
+        self.STATE_PATH = PATH + '.state'
+        self._state_changed = False
+
+        # td.txt already parsed, used instead of td.txt until td.txt changes
+        self.cache = StoreCache(PATH + '.cache', PATH)
+        self._shown_ranks = None
+
+        self._store = None
+
+        # Changes are only written to td.txt when the outermost transaction ends
+        self._transaction_depth = 0
+        self._changes = {}
+        self._rewrite = False
+        self._dirty = False
+
+        # file_version() when the store was loaded or last written
+        self._loaded_version = None
         
     def create_file(self):
         with open(self.PATH, mode='w') as f:
@@ -30,6 +67,26 @@ class Fileutils:
             f.write('[LISTS]\n')
             f.write('[WORKSPACES]\n')
 
+        self._store = None
+
+    def remove_files(self) -> None:
+        """
+        Deletes td.txt and every file kept next to it, so nothing of it comes back
+        when it is created again
+        """
+        for path in [self.PATH, self.JOURNAL_PATH, self.cache.PATH, self.RANKS_PATH, self.STATE_PATH]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+        self._store = None
+        self._changes = {}
+        self._rewrite = False
+        self._dirty = False
+        self._state_changed = False
+        self._shown_ranks = None
+
     def check_existance(self):
 
         if not os.path.exists(self.PATH):
@@ -38,544 +95,837 @@ class Fileutils:
         if not os.path.exists(self.CONFIGPATH):
             set_default_config(self.CONFIGPATH)
 
-    def check_blank_lines(self):
-        with open(self.PATH, mode='r') as f:
+    def check_format(self) -> bool:
+        """
+        Returns False if td.txt has been modified so much that it can't be parsed
+        """
+        # td.txt was parsed fine when the cache was written
+        if self._store is not None or self.cache.is_fresh():
+            return True
+
+        with open(self.PATH) as f:
             lines = f.readlines()
 
-            while "\n" in lines:
-                lines.remove("\n")
+        return '[TASKS]\n' in lines and '[LISTS]\n' in lines and '[WORKSPACES]\n' in lines
 
-        with open(self.PATH, mode='w') as f:
-            for line in lines:
-                f.write(line)
+    def check_blank_lines(self):
+        """
+        td.txt is rewritten from the store, which never writes blank lines.
+        So it only has to be rewritten if it was loaded with some
+        """
+        if self.store.has_blank_lines:
+            self.store.has_blank_lines = False
+            self._rewrite = True
+            self.save()
 
-    def get_checklist_item_index(self, item_name: str, line: list) -> int:
-        for index, name in enumerate(line):
-            if name[:-1] == item_name:
-                if index >= self.CHECKLIST_INDEX:
-                    break
+    def find_object(self, object_id: int) -> tuple:
+        """
+        Returns (kind, object) where kind is 'TASK', 'LIST' or 'WORKSPACE'.
+        This is a lookup in the store's id index so it doesn't depend on how big td.txt is
+        """
+        kind, obj = self.store.locate(object_id)
 
-        return index
+        if kind is None:
+            raise Exception("ID not found in file")
 
-    def get_lines_and_item_index(self, object_id: int) -> tuple:
-        INDEX = None
+        return kind, obj
 
-        with open(self.PATH, mode='r') as f:
-            lines = f.readlines()
-            for i, line in enumerate(lines):
-                line = line.split(self.SEPARATOR)
+    @property
+    def store(self) -> Store:
+        """
+        The parsed contents of td.txt.
+        td.txt is parsed the first time it is needed and every change is made
+        to the store before being written back
+        """
+        if self._store is None:
+            # Taken first so a change made while loading isn't missed by refresh()
+            self._loaded_version = self.file_version()
+            self._store = self.load_store()
 
-                if line[self.ID_INDEX] == str(object_id):
-                    INDEX = i
-                    break
+        return self._store
 
-        if INDEX is None:
-            raise Exception("ID not found in file")
-        
-        return lines, INDEX
+    def refresh(self) -> None:
+        """
+        Forgets the store if td.txt was changed by something else since it was loaded.
+        td serve keeps the store between commands and calls this before each one
+        """
+        if self._store is not None and not self._dirty and self.file_version() != self._loaded_version:
+            self._store = None
 
-    def get_tasks(self):
-        all_tasks = []
+    def load_store(self) -> Store:
+        """
+        Loads td.txt from the cache, or parses it if it changed since the cache was written,
+        and replays the journal on top of it if there is one
+        """
+        store = self.cache.load()
 
-        with open(self.PATH, 'r') as f:
-            lines = f.readlines()
-            for line in lines[1:]:
-                if line[self.ID_INDEX].isdigit():
-                    line = line.split(self.SEPARATOR)
-                    
-                    task = Task(task_id=line[self.ID_INDEX],
-                                name=line[self.NAME_INDEX],
-                                importance=line[self.IMPORTANCE_INDEX],
-                                description=line[self.DESCRIPTION_INDEX])
-                    
-                    for checklist_item in line[self.CHECKLIST_INDEX:]:
-                        if checklist_item == '\n':
-                            break
-                        elif checklist_item == '':
-                            continue
-
-                        task.add_item(checklist_item)
-
-                    all_tasks.append(task)
-
-                elif line == '[LISTS]\n':
-                    break
+        if store is None:
+            store = self.parse_file()
+            self.cache.save(store)
 
-        return all_tasks
+        if os.path.exists(self.JOURNAL_PATH):
+            self.replay_journal(store)
 
-    def get_task_ids(self):
-        task_ids = []
+        self.read_state(store)
 
-        with open(self.PATH, 'r') as f:
-            lines = f.readlines()
-            for line in lines[1:]:
-                if line == '[LISTS]\n':
-                    break
-                
-                line = line.split(self.SEPARATOR)
+        return store
+
+    def read_state(self, store: Store) -> None:
+        """
+        Sets the current workspace of store from STATE_PATH.
+        Without it the first line of td.txt is used, like before the state file existed
+        """
+        try:
+            with open(self.STATE_PATH) as f:
+                name, _, value = f.readline().partition('=')
+        except FileNotFoundError:
+            return
 
-                if line[self.ID_INDEX].isdigit():
-                    task_ids.append(int(line[self.ID_INDEX]))
+        if name != 'CURRENT_WORKSPACE' or not value.strip().isdigit():
+            return
 
-        return task_ids
-    
-    def get_lists(self):
-        all_lists = []
-        start_adding = False
+        ws_id = int(value)
+
+        # Left behind by a td.txt that has since been replaced
+        if ws_id != 0 and store.get_workspace(ws_id) is None:
+            return
 
+        store.current_workspace_id = ws_id
+
+    def write_state(self) -> None:
+        self.update_file([f"CURRENT_WORKSPACE={self.store.current_workspace_id}\n"], path=self.STATE_PATH, sync=False)
+
+    def commit_state(self) -> None:
+        """
+        Writes the state if it was changed, td.txt is left alone
+        """
+        if not self._state_changed:
+            return
+
+        self.write_state()
+
+        self._state_changed = False
+        self._loaded_version = self.file_version()
+
+    def parse_file(self) -> Store:
+        """
+        Parses td.txt on its own, without the journal
+        """
         with open(self.PATH, 'r') as f:
             lines = f.readlines()
-            for line in lines[1:]:
 
-                if line == '[LISTS]\n':
-                    start_adding = True
-                    continue
+        line = lines[self.CURRENT_WORKSPACE_VAR_INDEX].split('=')
+        store = Store(current_workspace_id=line[1].strip())
 
-                if line == '[WORKSPACES]\n':
-                    break
+        section = None
 
-                if start_adding:
-                    line = line.split(self.SEPARATOR)
-                    
-                    if line[self.ID_INDEX].isdigit():
-                        
-                        ls = List(
-                            list_id=line[self.ID_INDEX],
-                            name=line[self.NAME_INDEX]
-                        )
-
-                        for task_id in line[self.TASKS_INDEX:]:
-                            if task_id.isdigit():
-                                ls.task_ids.append(int(task_id))
-
-                            else:
-                                break
-                        all_lists.append(ls)
-
-        return all_lists
-    
-    def get_list_ids(self):
-        list_ids = []
-        start_adding = False
+        for line in lines[1:]:
+            if line in ['[TASKS]\n', '[LISTS]\n', '[WORKSPACES]\n']:
+                section = line
+                continue
 
-        with open(self.PATH) as f:
-            lines = f.readlines()
-            
-            for line in lines[1:]:
-                if line == '[LISTS]\n':
-                    start_adding = True
-                    continue
+            if line == '\n':
+                store.has_blank_lines = True
+                continue
+
+            if not line[self.ID_INDEX].isdigit():
+                continue
+
+            line = line.split(self.SEPARATOR)
+
+            if section == '[TASKS]\n':
+                store.add_task(self._parse_task(line))
 
-                if line == '[WORKSPACES]\n':
+            elif section == '[LISTS]\n':
+                store.add_list(self._parse_list(line))
+
+            elif section == '[WORKSPACES]\n':
+                store.add_workspace(self._parse_workspace(line))
+
+        return store
+
+    def _parse_task(self, line: list) -> Task:
+        # The last character of the name and of every checklist item is 1 if it's done and 0 if not
+        name = line[self.NAME_INDEX]
+
+        task = Task(task_id=line[self.ID_INDEX],
+                    name=name[:-1],
+                    importance=line[self.IMPORTANCE_INDEX],
+                    description=line[self.DESCRIPTION_INDEX],
+                    completed=name[-1:] == '1')
+
+        items = []
+        item_ids = None
+        fields = line[self.CHECKLIST_INDEX:]
+
+        for index, checklist_item in enumerate(fields):
+            if checklist_item == '\n':
+                break
+            elif checklist_item == '':
+                # The ids of the items follow an empty field when they aren't 1 to n
+                item_ids = self._parse_item_ids(fields[index+1:index+2], len(items))
+
+                if item_ids is not None:
                     break
-                
-                if start_adding:
-                    line = line.split(self.SEPARATOR)
-                    
-                    if line[self.ID_INDEX].isdigit():
-                        list_ids.append(int(line[self.ID_INDEX]))
-
-            return list_ids
-        
-    def get_workspaces(self) -> list:
-        all_workspaces = []
-        start_adding = False
 
-        with open(self.PATH, 'r') as f:
-            lines = f.readlines()
+                continue
 
-            for line in lines[1:]:
-                
-                if line == '[WORKSPACES]\n':
-                    start_adding = True
-                    continue
-
-                if start_adding:
-                    line = line.split(self.SEPARATOR)
-
-                    if line[self.ID_INDEX].isdigit():
-
-                        ws = Workspace(
-                            workspace_id=line[self.ID_INDEX],
-                            name=line[self.NAME_INDEX]
-                        )
-                    
-                    for list_id in line[self.LISTS_INDEX:]:
-                        if list_id.isdigit():
-                            ws.list_ids.append(int(list_id))
-                        
-                        else:
-                            break
-                    
-                    all_workspaces.append(ws)
-
-            return all_workspaces
-        
-    def get_workspace_ids(self) -> list:
-        workspace_ids = []
-        start_adding = False
+            items.append((checklist_item[:-1], checklist_item[-1] == '1'))
 
-        with open(self.PATH) as f:
-            lines = f.readlines()
+        for (item_name, done), item_id in zip(items, item_ids or [None] * len(items)):
+            task.add_item(item_name, done=done, item_id=item_id)
+
+        return task
+
+    def _parse_item_ids(self, field: list, num_items: int) -> list:
+        """
+        Returns the ids in a field like 2,5,6 or None if it isn't one id for each item in increasing order
+        """
+        if not field or not num_items:
+            return None
+
+        parts = field[0].split(',')
+
+        if len(parts) != num_items or not all(part.isdigit() for part in parts):
+            return None
+
+        item_ids = [int(part) for part in parts]
+
+        if item_ids[0] < 1 or any(a >= b for a, b in zip(item_ids, item_ids[1:])):
+            return None
+
+        return item_ids
+
+    def _parse_list(self, line: list) -> List:
+        ls = List(list_id=line[self.ID_INDEX], name=line[self.NAME_INDEX])
+
+        for task_id in line[self.TASKS_INDEX:]:
+            if task_id.isdigit():
+                ls.task_ids.append(int(task_id))
+            else:
+                break
+
+        return ls
+
+    def _parse_workspace(self, line: list) -> Workspace:
+        ws = Workspace(workspace_id=line[self.ID_INDEX], name=line[self.NAME_INDEX])
+
+        for list_id in line[self.LISTS_INDEX:]:
+            if list_id.isdigit():
+                ws.list_ids.append(int(list_id))
+            else:
+                break
+
+        return ws
+
+    def _dump_object(self, obj) -> str:
+        """
+        Returns the line of td.txt that represents a task, list or workspace
+        """
+        if isinstance(obj, Task):
+            fields = [str(obj.id), obj.name + self._flag(obj.completed), str(obj.importance), obj.description]
+            fields += [item.name + self._flag(item.done) for item in obj.checklist]
+
+            # Items are numbered 1 to n when a task is read, other ids have to be written
+            item_ids = obj.checklist.ids
+
+            if item_ids and item_ids[-1] != len(item_ids):
+                fields += ['', ','.join(str(item_id) for item_id in item_ids)]
+
+        elif isinstance(obj, List):
+            fields = [str(obj.id), obj.name] + [str(task_id) for task_id in obj.task_ids]
+
+        else:
+            fields = [str(obj.id), obj.name] + [str(list_id) for list_id in obj.list_ids]
+
+        return self.SEPARATOR.join(fields) + self.SEPARATOR + '\n'
 
-            for line in lines[1:]:
-                if line == '[WORKSPACES]\n':
-                    start_adding = True
-                    continue
+    def _flag(self, done: bool) -> str:
+        return '1' if done else '0'
 
-                if start_adding:
-                    line = line.split(self.SEPARATOR)
+    def get_tasks(self):
+        return list(self.store.tasks.values())
 
-                    if line[self.ID_INDEX].isdigit():
-                        workspace_ids.append(int(line[self.ID_INDEX]))
+    def get_task_ids(self):
+        return list(self.store.tasks)
+    
+    def get_lists(self):
+        return list(self.store.lists.values())
+    
+    def get_list_ids(self):
+        return list(self.store.lists)
         
-        return workspace_ids
+    def get_workspaces(self) -> list:
+        return list(self.store.workspaces.values())
+        
+    def get_workspace_ids(self) -> list:
+        return list(self.store.workspaces)
         
     def get_all_ids(self):
+        return self.store.get_all_ids()
 
-        all_ids = self.get_task_ids() + self.get_list_ids() + self.get_workspace_ids()
-        all_ids.sort()
+    def generate_id(self) -> int:
+        """
+        Returns the smallest id that isn't in use.
+        The id counts as used from now on even before anything is added with it
+        """
+        return self.store.ids.allocate()
 
-        return all_ids
+    def reserve_ids(self, count: int) -> list:
+        """
+        Returns count unused ids for adding many objects at once
+        """
+        return self.store.ids.reserve(count)
 
-    def mark_checklist_item_as_done(self, object_id: int, item_name: str = ""):
-        lines, INDEX = self.get_lines_and_item_index(object_id)
-        line = lines[INDEX].split(self.SEPARATOR)
-        
-        # index = self.get_checklist_item_index(item_name, line)
-        for index, item in enumerate(line[self.CHECKLIST_INDEX:]):
-            if item[:-1] == item_name:
-                if item[-1] == '0':
-                    line[index+self.CHECKLIST_INDEX] = line[index+self.CHECKLIST_INDEX][:-1] + '1'
-                    break
+    def _find_checklist_item(self, task: Task, item_name: str = "", item_id: int = None) -> int:
+        """
+        Returns the index of the checklist item with the id item_id, or of the first
+        one called item_name if no id is given.
+        Returns None if the task has no such item
+        """
+        if item_id is not None:
+            return task.checklist.find(item_id)
 
-        lines[INDEX] = self.SEPARATOR.join(line)
-        self.update_file(lines)
+        return task.checklist.index(item_name)
 
-    def mark_checklist_item_as_undone(self, object_id: int, item_name: str = ""):
-        lines, INDEX = self.get_lines_and_item_index(object_id)
-        line = lines[INDEX].split(self.SEPARATOR)
+    def mark_checklist_item_as_done(self, object_id: int, item_name: str = "", item_id: int = None):
+        task = self.store.get_task(object_id)
 
-        # index = self.get_checklist_item_index(rank, line)
+        if item_id is not None:
+            index = task.checklist.find(item_id)
 
-        for index, item in enumerate(line[self.CHECKLIST_INDEX:]):
-            if item[:-1] == item_name:
-                if item[-1] == '1':
-                    line[index+self.CHECKLIST_INDEX] = line[index+self.CHECKLIST_INDEX][:-1] + '0'
+            if index is not None:
+                task.checklist.set_done(index, True)
 
-        lines[INDEX] = self.SEPARATOR.join(line)
-        self.update_file(lines)
+        else:
+            for index, item in enumerate(task.checklist):
+                if item.name == item_name:
+                    if not item.done:
+                        task.checklist.set_done(index, True)
+                        break
 
-    def mark_task_as_done(self, object_id: int):
-        lines, INDEX = self.get_lines_and_item_index(object_id)
-        line = lines[INDEX].split(self.SEPARATOR)
-        
-        line[self.NAME_INDEX] = line[self.NAME_INDEX][:-1] + '1'
+        self.save(task)
+
+    def mark_checklist_item_as_undone(self, object_id: int, item_name: str = "", item_id: int = None):
+        task = self.store.get_task(object_id)
+
+        if item_id is not None:
+            index = task.checklist.find(item_id)
+
+            if index is not None:
+                task.checklist.set_done(index, False)
+
+        else:
+            for index, item in enumerate(task.checklist):
+                if item.name == item_name:
+                    task.checklist.set_done(index, False)
+
+        self.save(task)
 
-        lines[INDEX] = self.SEPARATOR.join(line)
-        self.update_file(lines)
+    def mark_task_as_done(self, object_id: int):
+        self.mark_tasks([object_id], done=True)
 
     def mark_task_as_undone(self, object_id: int):
-        lines, INDEX = self.get_lines_and_item_index(object_id)
-        line = lines[INDEX].split(self.SEPARATOR)
-        
-        line[self.NAME_INDEX] = line[self.NAME_INDEX][:-1] + '0'
+        self.mark_tasks([object_id], done=False)
 
-        lines[INDEX] = self.SEPARATOR.join(line)
-        self.update_file(lines)
+    def mark_tasks(self, task_ids, done: bool = True):
+        """
+        Marks every task as done (or undone) and saves them all at once
+        """
+        tasks = [self.store.get_task(task_id) for task_id in task_ids]
 
-    def add_task_to_file(self, task: Task):
+        if tasks == []:
+            return
 
-        with open(self.PATH, mode='r') as f:
-            lines = f.readlines()
+        for task in tasks:
+            task.completed = done
 
-            for index, line in enumerate(lines):
-                if line == '[LISTS]\n':
-                    # The zero after id represents whether the task is completed or not
-                    lines.insert(index, f"{task.id}{self.SEPARATOR}{task.name}{self.SEPARATOR}{task.importance}{self.SEPARATOR}{task.description}{self.SEPARATOR}\n")
-                    break
+        self.save(*tasks)
+
+    def toggle_checklist_items(self, task_id: int, item_ids, done: bool = True):
+        """
+        Marks every item of the task with an id in item_ids as done (or undone)
+        """
+        task = self.store.get_task(task_id)
 
-        self.update_file(lines)
+        for item_id in item_ids:
+            index = task.checklist.find(item_id)
 
-    def add_list_to_file(self, ls: List):
-        
-        with open(self.PATH, mode='r') as f:
-            lines = f.readlines()
+            if index is not None:
+                task.checklist.set_done(index, done)
 
-            for index, line in enumerate(lines):
-                if line == '[WORKSPACES]\n':
-                    lines.insert(index, f"{ls.id}{self.SEPARATOR}{ls.name}{self.SEPARATOR}\n")
-                    break
+        self.save(task)
 
-        self.update_file(lines)
+    def add_task_to_file(self, task: Task):
+        self.store.add_task(task)
+        self.save(task)
+
+    def add_list_to_file(self, ls: List):
+        self.store.add_list(ls)
+        self.save(ls)
 
     def add_workspace_to_file(self, ws: Workspace):
-        with open(self.PATH, mode='a') as f:
-            f.write(f"{ws.id}{self.SEPARATOR}{ws.name}{self.SEPARATOR}\n")
+        self.store.add_workspace(ws)
+        self.save(ws)
 
     def _find_list_with_task_id(self, task_id: int) -> int:
         """
         Finds a list given a task id
         returns the id of the list
         """
-        task_id = int(task_id)
-
-        lists = self.get_lists()
-
-        for ls in lists:
-            if task_id in ls.task_ids:
-                return ls.id
+        return self.store.task_parents.get(int(task_id))
         
-    def _find_workspace_with_list_id(self, list_id: int) -> int:
-
-        all_workspaces = self.get_workspaces()
-
-        for ws in all_workspaces:
-            if list_id in ws.list_ids:
-                return ws.id
-
     def delete_task(self, task_id: int, task_only: bool = False):
         """
         If task only is true
         only a task is deleted and its id is not deleted from a list
         """
-        lines, INDEX = self.get_lines_and_item_index(task_id)
+        task_id = int(task_id)
 
-        lines.remove(lines[INDEX])
+        changed = [self.store.remove_task(task_id)]
 
         if not task_only:
             list_id = self._find_list_with_task_id(task_id)
-            # Updating index to the index of the list
-            _, INDEX = self.get_lines_and_item_index(int(list_id))
-            INDEX -= 1 # This is done because a task has been deleted
-
-            for line in lines:
-                line = line.split(self.SEPARATOR)
-                
-                if str(list_id) == line[self.ID_INDEX]:
-                    line.remove(str(task_id))
-                    break
-        
-            lines[INDEX] = self.SEPARATOR.join(line)
+            ls = self.store.remove_task_from_list(list_id, task_id)
 
-        self.update_file(lines)
+            changed.append(ls)
 
-    def delete_list(self, list_id: int, list_only: bool = False):
-        lines, INDEX = self.get_lines_and_item_index(list_id)
+        self.save(*changed)
 
-        line = lines[INDEX].split(self.SEPARATOR)
-        
-        for task_id in line[self.TASKS_INDEX:]:
-            if task_id.isdigit():
-                self.delete_task(int(task_id), task_only=True)
+    def delete_tasks(self, task_ids):
+        """
+        Deletes many tasks at once. Every list they were in is gone through once
+        instead of once for every task
+        """
+        self.delete_cascade(Cascade(self.store, [self.store.get_task(task_id) for task_id in task_ids]))
 
-        # Redoing this to update lines after deletion of tasks
-        lines, INDEX = self.get_lines_and_item_index(list_id)
-        lines.remove(lines[INDEX])
+    def move_tasks(self, task_ids, list_id: int):
+        """
+        Moves the tasks to the end of a list in the order they're given.
+        Like a moved task they're also written last in td.txt
+        """
+        task_ids = list(dict.fromkeys(int(task_id) for task_id in task_ids))
 
-        if not list_only:
-            ws_id = self._find_workspace_with_list_id(list_id)
-            
-            _, INDEX = self.get_lines_and_item_index(int(ws_id))
-            INDEX -= 1 # This is done because a list has been deleted
-
-            for line in lines:
-                line = line.split(self.SEPARATOR)
-                
-                if str(ws_id) == line[self.ID_INDEX]:
-                    line.remove(str(list_id))
-                    break
+        if task_ids == []:
+            return
 
-            lines[INDEX] = self.SEPARATOR.join(line)
+        removed = {}
 
-        self.update_file(lines)
+        for task_id in task_ids:
+            removed.setdefault(self._find_list_with_task_id(task_id), set()).add(task_id)
 
-    def delete_workspace(self, ws_id: int):
-        lines, INDEX = self.get_lines_and_item_index(ws_id)
+        changed = [self.store.remove_task(task_id) for task_id in task_ids]
+        tasks = changed[:]
 
-        line = lines[INDEX].split(self.SEPARATOR)
+        for old_list_id, list_task_ids in removed.items():
+            if old_list_id is not None:
+                changed.append(self.store.remove_tasks_from_list(old_list_id, list_task_ids))
 
-        for list_id in line[self.LISTS_INDEX:]:
-            if list_id.isdigit():
-                self.delete_list(int(list_id), list_only=True)
+        # Saved as deleted and then added again so the journal puts them last as well
+        self.save(*changed)
 
-        # Redoing this to update lines after deletion of lists
-        lines, INDEX = self.get_lines_and_item_index(ws_id)
-        lines.remove(lines[INDEX])
+        for task in tasks:
+            self.store.add_task(task)
 
-        self.update_file(lines)
+        self.save(*tasks, self.store.add_tasks_to_list(list_id, task_ids))
 
-    def delete_item(self, item_type: str, object_id: int, item_name: str = ""):
-        lines, INDEX = self.get_lines_and_item_index(object_id)
-        line = lines[INDEX].split(self.SEPARATOR)
+    def delete_list(self, list_id: int):
+        self.delete_cascade(Cascade(self.store, [self.store.get_list(list_id)]))
 
-        if item_type == 'checklist' and item_name != "":
-            # This deletes the first occurence of the item
-            index = self.get_checklist_item_index(item_name, line)
-            del line[index]
+    def delete_workspace(self, ws_id: int):
+        self.delete_cascade(Cascade(self.store, [self.store.get_workspace(ws_id)]))
 
-            # TODO: Remove this when workspaces are implemented
-            # Check to see if a comma get deleted in the last line 
-            if line[-1] != '\n':
-                # If this is the last line
-                if len(line[self.CHECKLIST_INDEX:]) == 0:
-                    line.append('')
-            
-        lines[INDEX] = self.SEPARATOR.join(line)
-        self.update_file(lines)
+    def delete_cascade(self, cascade: Cascade):
+        """
+        Deletes everything in the cascade, saves it once and gives the ids back to the allocator
+        """
+        store = self.store
 
-    def delete_task_description(self, task_id: int):
-        lines, INDEX = self.get_lines_and_item_index(task_id)
-        line = lines[INDEX].split(self.SEPARATOR)
+        changed = [store.remove_task(task_id) for task_id in cascade.task_ids]
+        changed += [store.remove_list(list_id) for list_id in cascade.list_ids]
+        changed += [store.remove_workspace(ws_id) for ws_id in cascade.workspace_ids]
 
-        line[self.DESCRIPTION_INDEX] = ''
+        for parent_id, child_ids in cascade.detached.items():
+            if store.kind_of(parent_id) == 'LIST':
+                changed.append(store.remove_tasks_from_list(parent_id, child_ids))
+            else:
+                changed.append(store.remove_lists_from_workspace(parent_id, child_ids))
 
-        lines[INDEX] = self.SEPARATOR.join(line)
-        self.update_file(lines)
+        if changed != []:
+            self.save(*changed)
 
-    def add_task_to_list(self, list_id: int, task_id: int):
-        lines, INDEX = self.get_lines_and_item_index(list_id)
-        line = lines[INDEX].split(self.SEPARATOR)
+    def reclaimed_bytes(self, cascade: Cascade) -> int:
+        """
+        How much smaller td.txt gets once the cascade is deleted
+        """
+        store = self.store
 
-        if line[self.TASKS_INDEX][-2:] == '\n' or line[-1] == '\n':
-            line.remove('\n')
-            line.append(str(task_id))
-            line.append('\n')
+        size = sum(len(self._dump_object(store.get_task(task_id)).encode()) for task_id in cascade.task_ids)
+        size += sum(len(self._dump_object(store.get_list(list_id)).encode()) for list_id in cascade.list_ids)
+        size += sum(len(self._dump_object(store.get_workspace(ws_id)).encode()) for ws_id in cascade.workspace_ids)
 
-        else:
-            # TODO: Remove this once workspaces are added
-            # line[self.TASKS_INDEX] = line[self.TASKS_INDEX] + str(task_id) + self.SEPARATOR
-            if '' in line:
-                line.remove('')
-                
-            line.append(str(task_id))
+        # Every id taken out of a list or workspace is a field of its line
+        for child_ids in cascade.detached.values():
+            size += sum(len(str(child_id)) + len(self.SEPARATOR.encode()) for child_id in child_ids)
 
-        lines[INDEX] = self.SEPARATOR.join(line)
-        self.update_file(lines)
+        return size
 
-    def add_list_to_workspace(self, workspace_id: int, list_id: int):
-        lines, INDEX = self.get_lines_and_item_index(workspace_id)
-        line = lines[INDEX].split(self.SEPARATOR)
-        
-        if line[self.LISTS_INDEX][-2:] == '\n' or line[-1] == '\n':
-            line.remove('\n')
-            line.append(str(list_id))
-            line.append('\n')
-        
-        else:
-            if '' in line:
-                line.remove('')
+    def delete_item(self, item_type: str, object_id: int, item_name: str = "", item_id: int = None):
+        task = self.store.get_task(object_id)
 
-            line.append(str(list_id))
+        if item_type == 'checklist' and (item_name != "" or item_id is not None):
+            # Without an id this deletes the first occurence of the item
+            index = self._find_checklist_item(task, item_name, item_id)
 
-        lines[INDEX] = self.SEPARATOR.join(line)
-        
-        self.update_file(lines)
+            if index is not None:
+                task.checklist.remove(index)
+            
+        self.save(task)
 
-    def add_item(self, item_type: str, item_name: str, object_id: int):
-        lines, INDEX = self.get_lines_and_item_index(object_id)
-        line = lines[INDEX].split(self.SEPARATOR)
+    def delete_task_description(self, task_id: int):
+        task = self.store.get_task(task_id)
+        task.description = ''
+
+        self.save(task)
+
+    def add_task_to_list(self, list_id: int, task_id: int):
+        ls = self.store.add_task_to_list(list_id, task_id)
+        self.save(ls)
+
+    def add_list_to_workspace(self, workspace_id: int, list_id: int):
+        ws = self.store.add_list_to_workspace(workspace_id, list_id)
+        self.save(ws)
+
+    def add_item(self, item_type: str, item_name: str, object_id: int) -> int:
+        """
+        Returns the id of the new checklist item
+        """
+        task = self.store.get_task(object_id)
+        item_id = None
 
         if item_type == 'checklist':
-            item_name = item_name + '0' # 0 is meant to represent if the item is completed or not
-            if line[self.CHECKLIST_INDEX][-1:] == '\n':
-                line[self.CHECKLIST_INDEX] = line[self.CHECKLIST_INDEX][:-2] + item_name + self.SEPARATOR + '\n'
-            else:
-                if line[-1] == '\n':
-                    line[self.CHECKLIST_INDEX] = line[self.CHECKLIST_INDEX] + self.SEPARATOR + item_name
-                else:
-                    if line[self.CHECKLIST_INDEX] == '':
-                        line[self.CHECKLIST_INDEX] = line[self.CHECKLIST_INDEX] + item_name
-                    else:
-                        line[self.CHECKLIST_INDEX] = line[self.CHECKLIST_INDEX] + self.SEPARATOR + item_name
+            item_id = task.add_item(item_name)
 
-        lines[INDEX] = self.SEPARATOR.join(line)
-        self.update_file(lines)
+        self.save(task)
 
-    def edit_task(self, item_type: str, object_id: int, new_item: str, item_name: str = ""):
-        lines, INDEX = self.get_lines_and_item_index(object_id)
-        line = lines[INDEX].split(self.SEPARATOR)
+        return item_id
 
-        if item_type == 'name':
+    def edit_task(self, item_type: str, object_id: int, new_item: str, item_name: str = "", item_id: int = None):
+        task = self.store.get_task(object_id)
 
-            # If the task is not completed
-            if line[self.NAME_INDEX][-1] == '0':
-                line[self.NAME_INDEX] = new_item + '0'
-            else:
-                line[self.NAME_INDEX] = new_item + '1'
+        if item_type == 'name':
+            task.name = new_item
 
         elif item_type == 'id':
-            line[self.ID_INDEX] = new_item
+            self.store.remove_task(task.id)
+            task.id = int(new_item)
+            self.store.add_task(task)
 
-        elif item_type == 'importance':
-            if line[self.IMPORTANCE_INDEX][1:] == '\n':
-                line[self.IMPORTANCE_INDEX] = new_item + '\n'
+            # The journal can't express an id changing
+            self._rewrite = True
 
-            else:
-                line[self.IMPORTANCE_INDEX] = new_item
+        elif item_type == 'importance':
+            task.importance = int(new_item)
 
         elif item_type == "description":
-            line[self.DESCRIPTION_INDEX] = new_item
+            task.description = new_item
         
         else:
             # item_type == checklist
-            index = self.get_checklist_item_index(item_name, line)
-            line[index] = new_item + '0'
+            index = self._find_checklist_item(task, item_name, item_id)
 
-        lines[INDEX] = self.SEPARATOR.join(line)
-        self.update_file(lines)
+            if index is not None:
+                task.checklist.replace(index, new_item)
 
-    def rename_list(self, ls_id: int, new_name: str) -> None:
-        lines, INDEX = self.get_lines_and_item_index(ls_id)
-        line = lines[INDEX].split(self.SEPARATOR)
+        self.save(task)
 
-        line[self.NAME_INDEX] = new_name
+    def rename_list(self, ls_id: int, new_name: str) -> None:
+        ls = self.store.get_list(ls_id)
+        ls.name = new_name
 
-        lines[INDEX] = self.SEPARATOR.join(line)
-        self.update_file(lines)
+        self.save(ls)
 
     def rename_workspace(self, ws_id: int, new_name: str) -> None:
-        lines, INDEX = self.get_lines_and_item_index(ws_id)
-        line = lines[INDEX].split(self.SEPARATOR)
-
-        line[self.NAME_INDEX] = new_name
+        ws = self.store.get_workspace(ws_id)
+        ws.name = new_name
 
-        lines[INDEX] = self.SEPARATOR.join(line)
-        self.update_file(lines)
+        self.save(ws)
 
     def get_current_workspace_id(self) -> int:
         """
         Returns None if no workspace yet exists or if in the main menu
         """
-        with open(self.PATH) as f:
-            line = f.readlines()[self.CURRENT_WORKSPACE_VAR_INDEX]
-            line = line.split('=')
-
-            line[1] = line[1][:-1]
+        c_ws_id = self.store.current_workspace_id
 
         # This check is for first run
         # TODO: Add defualt workspace on startup
-        if int(line[1]) != 0:
-            return int(line[1])
+        if c_ws_id != 0:
+            return c_ws_id
         
         # If no workspace yet exists or in the main menu
         else:
             return None
 
     def set_current_workspace(self, ws_id: int):
-        with open(self.PATH) as f:
-            lines = f.readlines()
-            line = lines[self.CURRENT_WORKSPACE_VAR_INDEX]
+        self.store.current_workspace_id = int(ws_id)
+        self._state_changed = True
 
-            line = line.split('=')
+        if self._transaction_depth == 0:
+            self.commit_state()
 
-            line[1] = str(ws_id) + '\n'
+    def dump_store(self) -> list:
+        """
+        Turns the store back into the lines of td.txt
+        """
+        store = self.store
 
-        lines[self.CURRENT_WORKSPACE_VAR_INDEX] = '='.join(line)
+        lines = [f"CURRENT_WORKSPACE={store.current_workspace_id}\n", '[TASKS]\n']
+        lines += [self._dump_object(task) for task in store.tasks.values()]
 
-        self.update_file(lines)
+        lines.append('[LISTS]\n')
+        lines += [self._dump_object(ls) for ls in store.lists.values()]
 
-    def update_file(self, lines: list) -> None:
-        with open(self.PATH, mode='w') as f:
-            for line in lines:
-                f.write(line)
+        lines.append('[WORKSPACES]\n')
+        lines += [self._dump_object(ws) for ws in store.workspaces.values()]
+
+        return lines
+
+    @contextmanager
+    def transaction(self):
+        """
+        Buffers every change made inside the block and writes td.txt once
+        when the outermost transaction finishes.
+        If the block raises, the buffered changes are thrown away.
+        """
+        self._transaction_depth += 1
+
+        try:
+            yield
+
+        except BaseException:
+            self._transaction_depth -= 1
+
+            if self._transaction_depth == 0:
+                # Reload td.txt next time it is needed
+                self._store = None
+                self._changes = {}
+                self._rewrite = False
+                self._dirty = False
+                self._state_changed = False
+                self._shown_ranks = None
+
+            raise
+
+        self._transaction_depth -= 1
+
+        if self._transaction_depth == 0:
+            self.commit()
+            self.commit_state()
+            self.write_rank_snapshot()
+
+    def save(self, *objects) -> None:
+        """
+        Called after the store has been changed.
+        objects are the tasks, lists and workspaces that were added, edited or deleted
+        and are what gets written to the journal.
+        The change is written straight away unless a transaction is open
+        """
+        for obj in objects:
+            op = self.JOURNAL_OPS[type(obj)]
+
+            if self.store.get_object(op, obj.id) is obj:
+                self._changes[(op, obj.id)] = None
+
+            else:
+                # The object was deleted. If it gets added again it is written
+                # after the deletion so it ends up last, just like in td.txt
+                self._changes.pop((op, obj.id), None)
+                self._changes[('DELETE_' + op, obj.id)] = None
+
+        self.store.mark_changed()
+        self._dirty = True
+
+        if self._transaction_depth == 0:
+            self.commit()
+
+    def commit(self) -> None:
+        if not self._dirty:
+            return
+
+        if self.journal and not self._rewrite:
+            self.append_to_journal(self._journal_records())
+
+            if os.path.getsize(self.JOURNAL_PATH) > self.JOURNAL_COMPACT_SIZE:
+                self.compact()
+
+        else:
+            self.compact()
+
+        self._changes = {}
+        self._rewrite = False
+        self._dirty = False
+        self._loaded_version = self.file_version()
+
+    def compact(self) -> None:
+        """
+        Writes the whole store to td.txt and removes the journal
+        since td.txt now has every change in it
+        """
+        self.update_file(self.dump_store())
+        self.cache.save(self.store)
+
+        if os.path.exists(self.JOURNAL_PATH):
+            os.remove(self.JOURNAL_PATH)
+
+    def _journal_records(self) -> list:
+        SEP = self.SEPARATOR
+        records = []
+
+        for op, object_id in self._changes:
+            if op.startswith('DELETE_'):
+                records.append(f"{op}{SEP}{object_id}{SEP}\n")
+            else:
+                obj = self.store.get_object(op, object_id)
+                records.append(f"{op}{SEP}{self._dump_object(obj)}")
+
+        return records
+
+    def append_to_journal(self, records: list) -> None:
+        with open(self.JOURNAL_PATH, mode='a') as f:
+            f.writelines(records)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def replay_journal(self, store: Store) -> None:
+        """
+        Applies every record in the journal to store.
+        Records hold the whole new line of an object, so replaying one twice is harmless
+        """
+        with open(self.JOURNAL_PATH) as f:
+            records = f.readlines()
+
+        for record in records:
+            # A record that was only partly written before a crash
+            if not record.endswith('\n'):
+                break
+
+            op, *line = record.split(self.SEPARATOR)
+
+            # Written by td before the current workspace moved to STATE_PATH
+            if op == 'CURRENT_WORKSPACE':
+                store.current_workspace_id = int(line[0])
+
+            elif op.startswith('DELETE_'):
+                store.discard_object(op[len('DELETE_'):], int(line[self.ID_INDEX]))
+
+            elif op == 'TASK':
+                store.add_task(self._parse_task(line))
+
+            elif op == 'LIST':
+                store.add_list(self._parse_list(line))
+
+            elif op == 'WORKSPACE':
+                store.add_workspace(self._parse_workspace(line))
+
+    def file_version(self) -> str:
+        """
+        Identifies the current contents of td.txt, its journal and the state file.
+        They're only ever replaced or appended to so any write changes this
+        """
+        stamps = []
+
+        for path in [self.PATH, self.JOURNAL_PATH, self.STATE_PATH]:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stamps.append('-')
+                continue
+
+            stamps.append(f"{stat.st_ino}:{stat.st_mtime_ns}:{stat.st_size}")
+
+        return ','.join(stamps)
+
+    def remember_ranks(self, rank_map: RankMap) -> None:
+        """
+        Called by show with the ranks it printed.
+        They are written to RANKS_PATH once the command's changes have been written
+        """
+        self._shown_ranks = rank_map
+
+    def write_rank_snapshot(self) -> None:
+        rank_map = self._shown_ranks
+        self._shown_ranks = None
+
+        if rank_map is None or self._store is None:
+            return
+
+        # Only the ranks of the current workspace (or the main menu) are used to resolve ids,
+        # and they are stale if the store was changed after show printed them
+        ws_id = 0 if rank_map.ws is None else rank_map.ws.id
+
+        if ws_id != self.store.current_workspace_id or rank_map.version != self.store.version:
+            return
+
+        lines = [
+            f"VERSION={self.file_version()}\n",
+            f"WORKSPACE={ws_id}\n",
+            ' '.join(str(object_id) for object_id in rank_map.rank_to_id[1:]) + '\n'
+        ]
+
+        try:
+            self.update_file(lines, path=self.RANKS_PATH, sync=False)
+        except OSError:
+            # The snapshot is only a shortcut, show still worked
+            pass
+
+    def read_rank_snapshot(self, ws: Workspace) -> RankMap:
+        """
+        Returns the ranks show last printed for ws if nothing has been written since.
+        Returns None if they have to be worked out again
+        """
+        if self._dirty:
+            return None
+
+        try:
+            with open(self.RANKS_PATH) as f:
+                version, ws_line, ids = f.read().split('\n')[:3]
+        except (FileNotFoundError, ValueError):
+            return None
+
+        ws_id = 0 if ws is None else ws.id
+
+        if version != f"VERSION={self.file_version()}" or ws_line != f"WORKSPACE={ws_id}":
+            return None
+
+        try:
+            return RankMap.from_ids(ws, [int(object_id) for object_id in ids.split()], self.store.version)
+        except ValueError:
+            return None
+
+    def update_file(self, lines: list, path: str = None, sync: bool = True) -> None:
+        """
+        Atomically replaces td.txt (or path) with lines.
+        The lines are written to a temporary file that is then renamed over td.txt
+        so td.txt is never left half written
+        """
+        if path is None:
+            path = self.PATH
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.td-', suffix='.tmp')
+
+        try:
+            match_mode(fd, path)
+
+            with os.fdopen(fd, mode='w') as f:
+                f.writelines(lines)
+
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            os.replace(tmp_path, path)
+
+        except BaseException:
+            os.remove(tmp_path)
+            raise
@@ -0,0 +1,96 @@
+import heapq
+
+class IdAllocator:
+    """
+    Hands out the smallest id that isn't used by a task, list or workspace.
+    Ids below the high-water mark that have been freed are kept in a heap,
+    everything from the high-water mark upwards is unused
+    """
+
+    def __init__(self, used_ids):
+        used = bytearray(max(used_ids, default=0) + 1)
+
+        for object_id in used_ids:
+            used[object_id] = 1
+
+        # 0 is never used as an id since it means the main menu
+        self.high = len(used)
+        self.free = set(object_id for object_id in range(1, self.high) if not used[object_id])
+        self._heap = sorted(self.free)
+
+        # Ids released while held aren't handed out again until they're let go
+        self.held = None
+
+    def allocate(self) -> int:
+        # Ids that were claimed again are only removed from the heap when they reach the top
+        while self._heap:
+            object_id = heapq.heappop(self._heap)
+
+            if object_id in self.free:
+                self.free.remove(object_id)
+                return object_id
+
+        object_id = self.high
+        self.high += 1
+
+        return object_id
+
+    def reserve(self, count: int) -> list:
+        """
+        Allocates count ids at once.
+        Freed ids are used up first and the rest is one range above the high-water mark
+        """
+        object_ids = []
+
+        while len(object_ids) < count and self.free:
+            object_ids.append(self.allocate())
+
+        remaining = count - len(object_ids)
+        object_ids += range(self.high, self.high + remaining)
+        self.high += remaining
+
+        return object_ids
+
+    def release(self, object_id: int) -> None:
+        if self.held is not None:
+            self.held.add(object_id)
+            return
+
+        if object_id < self.high and object_id not in self.free:
+            self.free.add(object_id)
+            heapq.heappush(self._heap, object_id)
+
+    def hold(self) -> None:
+        self.held = set()
+
+    def let_go(self) -> None:
+        """
+        Releases everything released since hold was called
+        """
+        held = self.held or set()
+        self.held = None
+
+        for object_id in held:
+            self.release(object_id)
+
+    def claim(self, object_id: int) -> None:
+        """
+        Marks an id that was chosen by something else as used
+        """
+        if self.held is not None:
+            # Re-added after being removed, like a task that's moved
+            self.held.discard(object_id)
+
+        if object_id >= self.high:
+            # Everything skipped over becomes free
+            for free_id in range(self.high, object_id):
+                self.free.add(free_id)
+                heapq.heappush(self._heap, free_id)
+
+            self.high = object_id + 1
+
+        else:
+            self.free.discard(object_id)
+
+    def __repr__(self):
+        return f"IdAllocator(high={self.high}, free={len(self.free)})"
@@ -0,0 +1,269 @@
+"""
+td import.
+Reads and checks every task in a CSV or NDJSON file and then adds them to the store in batches,
+creating the lists and workspaces they name. Every record has a name and can have a list,
+a workspace, an importance (1 - 3), a description, a checklist and a status (done or undone).
+In CSV the checklist items are separated by ';', in NDJSON it's an array of names
+or of objects with a name and done
+"""
+from td.utils.tasks import Task
+from td.utils.lists import List
+from td.utils.workspaces import Workspace
+from itertools import chain, islice
+import typer
+import json
+import csv
+
+FORMATS = ['csv', 'ndjson']
+
+CHECKLIST_SEPARATOR = ';'
+
+# Ids are reserved for this many tasks at a time
+BATCH_SIZE = 1000
+
+def detect_format(path: str, first_line: str) -> str:
+    """
+    Works out the format from the file extension or else from the first line
+    """
+    extension = path.rsplit('.', 1)[-1].lower()
+
+    if extension == 'csv':
+        return 'csv'
+
+    if extension in ['ndjson', 'jsonl', 'json']:
+        return 'ndjson'
+
+    return 'ndjson' if first_line.lstrip().startswith('{') else 'csv'
+
+def read_raw_records(lines, file_format: str):
+    """
+    Yields the line number and the fields of every record
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+
+        for fields in reader:
+            yield reader.line_num, fields
+
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        # Files are opened with newline='' for CSV, so a line can end in '\r\n' or '\r' as it is
+        line = line.rstrip('\r\n')
+
+        if line.strip() == '':
+            continue
+
+        if '\r' in line:
+            raise typer.BadParameter(f"Line {line_number} has a carriage return in it")
+
+        try:
+            fields = json.loads(line)
+        except ValueError:
+            raise typer.BadParameter(f"Line {line_number} isn't valid JSON")
+
+        if not isinstance(fields, dict):
+            raise typer.BadParameter(f"Line {line_number} isn't a JSON object")
+
+        yield line_number, fields
+
+def _parse_checklist(checklist, line_number: int) -> list:
+    """
+    Returns the items as (name, done) tuples
+    """
+    if checklist is None or checklist == '':
+        return []
+
+    if isinstance(checklist, str):
+        return [(name.strip(), False) for name in checklist.split(CHECKLIST_SEPARATOR) if name.strip() != '']
+
+    if not isinstance(checklist, list):
+        raise typer.BadParameter(f"Line {line_number}: the checklist has to be a list")
+
+    items = []
+
+    for item in checklist:
+        if isinstance(item, dict):
+            items.append((str(item.get('name', '')), bool(item.get('done', False))))
+        else:
+            items.append((str(item), False))
+
+    return items
+
+def _has_line_break(text: str) -> bool:
+    """
+    td.txt is read with universal newlines, so anything str.splitlines() splits on
+    ('\r', '\x0b', '\x85', '\u2028' and the rest, not only '\n') would end the line there
+    """
+    return ''.join(text.splitlines()) != text
+
+def _check_text(text: str, what: str, line_number: int, separator: str) -> None:
+    """
+    td.txt has one object per line with its fields separated by separator,
+    so neither can be in anything that's written to it
+    """
+    if text is not None and (_has_line_break(text) or separator in text):
+        raise typer.BadParameter(f"Line {line_number}: the {what} can't have a line break or {separator!r} in it")
+
+def read_records(lines, file_format: str, separator: str):
+    """
+    Yields (line number, name, list name, workspace name, importance, description, checklist, completed)
+    for every task. List and workspace names are None when they aren't given.
+    separator is Fileutils.SEPARATOR, which can't be in any of the text
+    """
+    for line_number, fields in read_raw_records(lines, file_format):
+        name = str(fields.get('name') or '').strip('\n')
+
+        if name == '':
+            raise typer.BadParameter(f"Line {line_number}: a task needs a name")
+
+        try:
+            # Clamped just like td add task -im
+            importance = min(max(int(fields.get('importance') or 1), 1), 3)
+        except (TypeError, ValueError):
+            raise typer.BadParameter(f"Line {line_number}: the importance has to be a number from 1 to 3")
+
+        status = str(fields.get('status') or 'undone').lower()
+
+        if status not in ['done', 'completed', 'undone']:
+            raise typer.BadParameter(f"Line {line_number}: the status has to be done or undone")
+
+        list_name = fields.get('list') or None
+        ws_name = fields.get('workspace') or None
+        description = str(fields.get('description') or '')
+        checklist = _parse_checklist(fields.get('checklist'), line_number)
+
+        _check_text(name, 'name', line_number, separator)
+        _check_text(None if list_name is None else str(list_name), 'list', line_number, separator)
+        _check_text(None if ws_name is None else str(ws_name), 'workspace', line_number, separator)
+        _check_text(description, 'description', line_number, separator)
+
+        for item_name, _ in checklist:
+            _check_text(item_name, 'checklist item', line_number, separator)
+
+        yield (
+            line_number,
+            name,
+            list_name,
+            ws_name,
+            importance,
+            description,
+            checklist,
+            status != 'undone',
+        )
+
+class Importer:
+    """
+    Adds the records to the store through fileutils, which is expected to be in a transaction
+    so that everything is written in one go
+    """
+
+    def __init__(self, fileutils) -> None:
+        self.fileutils = fileutils
+        store = fileutils.store
+
+        # The first workspace with a name and the first list with a name in every workspace
+        self.workspaces = {}
+        self.lists = {}
+
+        for ws in store.workspaces.values():
+            self.workspaces.setdefault(ws.name, ws)
+
+            for list_id in ws.list_ids:
+                ls = store.get_list(list_id)
+
+                if ls is not None:
+                    self.lists.setdefault((ws.id, ls.name), ls)
+
+        self.num_tasks = 0
+        self.num_lists = 0
+        self.num_workspaces = 0
+
+    def get_workspace(self, name: str, line_number: int) -> Workspace:
+        if name is None:
+            ws_id = self.fileutils.get_current_workspace_id()
+
+            if ws_id is None:
+                raise typer.BadParameter(f"Line {line_number}: no workspace was given and you're in the main menu!")
+
+            return self.fileutils.store.get_workspace(ws_id)
+
+        name = str(name)
+        ws = self.workspaces.get(name)
+
+        if ws is None:
+            ws = Workspace(name=name, workspace_id=self.fileutils.generate_id())
+            self.fileutils.add_workspace_to_file(ws)
+
+            self.workspaces[name] = ws
+            self.num_workspaces += 1
+
+        return ws
+
+    def get_list(self, ws: Workspace, name: str) -> List:
+        """
+        Without a name tasks go to the first list of the workspace like td add task does
+        """
+        if name is None:
+            if len(ws.list_ids) > 0:
+                return self.fileutils.store.get_list(ws.list_ids[0])
+
+            name = 'To Do'
+
+        name = str(name)
+        ls = self.lists.get((ws.id, name))
+
+        if ls is None:
+            ls = List(list_id=self.fileutils.generate_id(), name=name)
+            self.fileutils.add_list_to_file(ls)
+            self.fileutils.add_list_to_workspace(ws.id, ls.id)
+
+            self.lists[(ws.id, name)] = ls
+            self.num_lists += 1
+
+        return ls
+
+    def add_batch(self, records: list) -> None:
+        task_ids = self.fileutils.reserve_ids(len(records))
+
+        for task_id, record in zip(task_ids, records):
+            line_number, name, list_name, ws_name, importance, description, checklist, completed = record
+
+            ls = self.get_list(self.get_workspace(ws_name, line_number), list_name)
+
+            task = Task(name=name, task_id=task_id, importance=importance, description=description, completed=completed)
+
+            for item_name, done in checklist:
+                task.add_item(item_name, done)
+
+            self.fileutils.add_task_to_file(task)
+            self.fileutils.add_task_to_list(ls.id, task.id)
+
+        self.num_tasks += len(records)
+
+    def import_lines(self, lines, file_format: str) -> None:
+        # Read in full first so nothing is added if any record is bad
+        records = iter(list(read_records(lines, file_format, self.fileutils.SEPARATOR)))
+
+        while True:
+            batch = list(islice(records, BATCH_SIZE))
+
+            if not batch:
+                break
+
+            self.add_batch(batch)
+
+def open_lines(f, path: str, file_format: str = None) -> tuple:
+    """
+    Returns the lines of f and its format, working it out if it isn't given
+    """
+    first_line = f.readline()
+    lines = chain([first_line], f)
+
+    if file_format is None:
+        file_format = detect_format(path, first_line)
+
+    if file_format not in FORMATS:
+        raise typer.BadParameter(f"The format has to be one of {', '.join(FORMATS)}")
+
+    return lines, file_format
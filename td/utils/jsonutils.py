@@ -0,0 +1,107 @@
+"""
+Output of show --json/--ndjson and count --json/--ndjson.
+Records are made straight from the store and written one at a time, nothing goes through rich
+"""
+from td.utils.tasks import Task
+from td.utils.lists import List
+from td.utils.workspaces import Workspace
+import json
+import sys
+
+class RecordWriter:
+    """
+    Writes records as they're made, either as NDJSON (one object per line)
+    or as a JSON array with one record per line
+    """
+
+    def __init__(self, ndjson: bool, file=None) -> None:
+        self.ndjson = ndjson
+        self.file = file
+        self.count = 0
+
+    def write(self, record: dict) -> None:
+        # sys.stdout is looked up every time since td serve and show --pager replace it
+        file = self.file or sys.stdout
+        line = json.dumps(record, ensure_ascii=False)
+
+        if self.ndjson:
+            file.write(line + '\n')
+        elif self.count == 0:
+            file.write('[\n' + line)
+        else:
+            file.write(',\n' + line)
+
+        self.count += 1
+
+    def close(self) -> None:
+        if self.ndjson:
+            return
+
+        file = self.file or sys.stdout
+
+        if self.count == 0:
+            file.write('[]\n')
+        else:
+            file.write('\n]\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def workspace_record(ws: Workspace, rank: int) -> dict:
+    return {
+        'type': 'workspace',
+        'rank': rank,
+        'id': ws.id,
+        'name': ws.name,
+    }
+
+def list_record(ls: List, rank: int, workspace_id: int) -> dict:
+    return {
+        'type': 'list',
+        'rank': rank,
+        'id': ls.id,
+        'name': ls.name,
+        'workspace': workspace_id,
+    }
+
+def task_record(task: Task, rank: int, list_id: int) -> dict:
+    """
+    The checklist items have the rank they're shown with in show -i, undone items first
+    """
+    items = sorted(task.checklist, key=lambda item: item.done)
+
+    return {
+        'type': 'task',
+        'rank': rank,
+        'id': task.id,
+        'name': task.name,
+        'importance': task.importance,
+        'status': 'done' if task.completed else 'undone',
+        'description': task.description,
+        'list': list_id,
+        'checklist': [
+            {'rank': item_rank, 'id': item.id, 'name': item.name, 'done': item.done}
+            for item_rank, item in enumerate(items, start=1)
+        ],
+    }
+
+def count_record(count: int, total: int, completed: bool, obj=None, rank: int = None) -> dict:
+    """
+    obj is the task, list or workspace that was counted in, None for the current workspace.
+    For a task the checklist items are counted
+    """
+    counted_in = None
+
+    if obj is not None:
+        counted_in = {'type': type(obj).__name__.lower(), 'rank': rank, 'id': obj.id, 'name': obj.name}
+
+    return {
+        'type': 'count',
+        'status': 'done' if completed else 'undone',
+        'count': count,
+        'total': total,
+        'in': counted_in,
+    }
@@ -1,9 +1,14 @@
+from array import array
+
 class List:
+    __slots__ = ('id', 'name', 'task_ids')
 
     def __init__(self, list_id: int, name: str):
         self.id = int(list_id)
         self.name = name
-        self.task_ids = []
+
+        # Unsigned ints packed together instead of a list of int objects
+        self.task_ids = array('I')
 
     def __repr__(self):
         return f"List({self.id}, {self.name})"
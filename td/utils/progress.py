@@ -0,0 +1,31 @@
+"""
+The progress bar printed under every list and task.
+It looks the same as a centered rich Progress with a description, a bar and an M/N column
+but it's just a renderable, so printing one doesn't start a live display and its refresh thread
+"""
+from rich.progress_bar import ProgressBar
+from rich.table import Table
+from rich.align import Align
+from rich.text import Text
+
+DESCRIPTION = "[progress.description][italic #96FF4B]Progress[/italic #96FF4B]"
+
+# Same as rich's BarColumn
+BAR_WIDTH = 40
+
+def make_progress_bar(total: int, completed: int) -> Align:
+    # Laid out the way Progress lays out its columns
+    table = Table.grid(padding=(0, 1))
+
+    for _ in range(3):
+        table.add_column()
+
+    bar = ProgressBar(total=max(0, total), completed=max(0, completed), width=BAR_WIDTH)
+
+    # Same as rich's MofNCompleteColumn
+    total_width = len(str(total))
+    count = Text(f"{completed:{total_width}d}/{total}", style="progress.download")
+
+    table.add_row(Text.from_markup(DESCRIPTION), bar, count)
+
+    return Align.center(table)
@@ -0,0 +1,100 @@
+from td.utils.lists import List
+from td.utils.workspaces import Workspace
+
+def tasks_in_list(store, ls: List) -> list:
+    """
+    Returns the tasks in a list in the order they are shown, most important first
+    """
+    tasks = [store.tasks[task_id] for task_id in ls.task_ids if task_id in store.tasks]
+    tasks.sort(key=lambda task: task.importance, reverse=True)
+
+    return tasks
+
+def lists_in_workspace(store, ws: Workspace) -> list:
+    return [store.lists[list_id] for list_id in ws.list_ids if list_id in store.lists]
+
+class RankMap:
+    """
+    The ranks shown to the user and the ids they stand for.
+
+    Inside a workspace the workspace is rank 1, its lists come next and then
+    the tasks of every list in order. In the main menu (ws is None) only
+    workspaces have ranks.
+    Everything is worked out in one pass and both directions are dict/list lookups
+    """
+
+    def __init__(self, store, ws: Workspace = None):
+        self.ws = ws
+
+        # The store.version the ranks were worked out at
+        self.version = None if store is None else store.version
+
+        # rank_to_id[rank] is the id with that rank, ranks start at 1
+        self.rank_to_id = [None]
+        self.id_to_rank = {}
+
+        if store is None:
+            return
+
+        if ws is None:
+            for workspace in store.workspaces.values():
+                self._add(workspace.id)
+
+            return
+
+        self._add(ws.id)
+
+        lists = lists_in_workspace(store, ws)
+
+        for ls in lists:
+            self._add(ls.id)
+
+        for ls in lists:
+            for task in tasks_in_list(store, ls):
+                self._add(task.id)
+
+    @classmethod
+    def from_ids(cls, ws: Workspace, object_ids: list, version: int):
+        """
+        Rebuilds a RankMap from its ids in rank order, like the snapshot show writes
+        """
+        rank_map = cls(None, ws)
+        rank_map.version = version
+
+        for object_id in object_ids:
+            rank_map._add(object_id)
+
+        return rank_map
+
+    def _add(self, object_id: int) -> None:
+        self.id_to_rank[object_id] = len(self.rank_to_id)
+        self.rank_to_id.append(object_id)
+
+    def get_id(self, rank: int) -> int:
+        """
+        Returns None if nothing has that rank
+        """
+        rank = int(rank)
+
+        if rank < 1 or rank >= len(self.rank_to_id):
+            return None
+
+        return self.rank_to_id[rank]
+
+    def get_rank(self, object_id: int) -> int:
+        """
+        Returns None if the object isn't shown in this workspace
+        """
+        return self.id_to_rank.get(int(object_id))
+
+    def get_ranks(self, object_ids) -> list:
+        """
+        Returns [(object_id, rank)] for every id that has a rank
+        """
+        return [(object_id, self.id_to_rank[object_id]) for object_id in object_ids if object_id in self.id_to_rank]
+
+    def __len__(self):
+        return len(self.rank_to_id) - 1
+
+    def __repr__(self):
+        return f"RankMap({self.ws}, {len(self)} ranks)"
@@ -0,0 +1,309 @@
+"""
+An SQLite backend for td.
+It only changes how the store is kept on disk: every command still loads the whole
+store into memory with a scan of each table, just like Fileutils does with td.txt,
+and reads are answered from there. What it saves is the writing, a commit only
+writes the rows of the objects that changed instead of rewriting a whole file.
+The indexes are there for those writes and for loading in order
+"""
+from td.utils.tasks import Task
+from td.utils.lists import List
+from td.utils.workspaces import Workspace
+from td.utils.store import Store
+from td.utils.fileutils import Fileutils
+from td.utils.config import set_default_config
+import sqlite3
+import os
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    completed INTEGER NOT NULL,
+    importance INTEGER NOT NULL,
+    description TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS checklist_items (
+    task_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    done INTEGER NOT NULL,
+    item_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS lists (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS list_tasks (
+    list_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    task_id INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS workspaces (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS workspace_lists (
+    workspace_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    list_id INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS tasks_position ON tasks (position);
+CREATE INDEX IF NOT EXISTS lists_position ON lists (position);
+CREATE INDEX IF NOT EXISTS workspaces_position ON workspaces (position);
+CREATE INDEX IF NOT EXISTS checklist_items_task ON checklist_items (task_id, position);
+CREATE INDEX IF NOT EXISTS list_tasks_list ON list_tasks (list_id, position);
+CREATE INDEX IF NOT EXISTS workspace_lists_workspace ON workspace_lists (workspace_id, position);
+
+-- Nothing looks rows up by these, they only made every write slower
+DROP INDEX IF EXISTS list_tasks_task;
+DROP INDEX IF EXISTS workspace_lists_list;
+"""
+
+class SqliteFileutils(Fileutils):
+
+    def __init__(self, PATH: str, CONFIGPATH: str):
+        super().__init__(PATH, CONFIGPATH)
+
+        self._connection = None
+
+        # Table -> position of the next row added to it in the commit being written
+        self._positions = {}
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.PATH)
+            self._connection.executescript(SCHEMA)
+            self._add_item_ids()
+
+        return self._connection
+
+    def _add_item_ids(self) -> None:
+        """
+        Databases made before checklist item ids were saved don't have the column,
+        their items get numbered 1 to n when they're loaded
+        """
+        db = self._connection
+        columns = [row[1] for row in db.execute("PRAGMA table_info(checklist_items)")]
+
+        if 'item_id' not in columns:
+            with db:
+                db.execute("ALTER TABLE checklist_items ADD COLUMN item_id INTEGER")
+
+    def create_file(self):
+        with self.connection:
+            self.connection.execute("INSERT OR IGNORE INTO state VALUES ('CURRENT_WORKSPACE', '0')")
+
+        self._store = None
+
+    def remove_files(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+        super().remove_files()
+
+    def check_existance(self):
+
+        if not os.path.exists(self.PATH):
+            self.create_file()
+
+        if not os.path.exists(self.CONFIGPATH):
+            set_default_config(self.CONFIGPATH)
+
+    def check_format(self) -> bool:
+        try:
+            self.connection.execute("SELECT value FROM state WHERE key = 'CURRENT_WORKSPACE'").fetchone()
+        except sqlite3.DatabaseError:
+            return False
+
+        return True
+
+    def load_store(self) -> Store:
+        db = self.connection
+
+        row = db.execute("SELECT value FROM state WHERE key = 'CURRENT_WORKSPACE'").fetchone()
+        store = Store(current_workspace_id=row[0] if row else 0)
+
+        for task_id, name, completed, importance, description in db.execute(
+                "SELECT id, name, completed, importance, description FROM tasks ORDER BY position"):
+            store.add_task(Task(name=name, task_id=task_id, importance=importance, description=description, completed=completed))
+
+        for task_id, name, done, item_id in db.execute(
+                "SELECT task_id, name, done, item_id FROM checklist_items ORDER BY task_id, position"):
+            store.get_task(task_id).add_item(name, done=done, item_id=item_id)
+
+        for list_id, name in db.execute("SELECT id, name FROM lists ORDER BY position"):
+            store.add_list(List(list_id=list_id, name=name))
+
+        for list_id, task_id in db.execute("SELECT list_id, task_id FROM list_tasks ORDER BY list_id, position"):
+            store.add_task_to_list(list_id, task_id)
+
+        for ws_id, name in db.execute("SELECT id, name FROM workspaces ORDER BY position"):
+            store.add_workspace(Workspace(name=name, workspace_id=ws_id))
+
+        for ws_id, list_id in db.execute("SELECT workspace_id, list_id FROM workspace_lists ORDER BY workspace_id, position"):
+            store.add_list_to_workspace(ws_id, list_id)
+
+        return store
+
+    def commit(self) -> None:
+        if not self._dirty:
+            return
+
+        self._positions = {}
+
+        with self.connection:
+            if self._rewrite:
+                self.import_store(self.store)
+
+            else:
+                for op, object_id in self._changes:
+                    if op.startswith('DELETE_'):
+                        self._delete_object(op[len('DELETE_'):], object_id)
+
+                    else:
+                        self._write_object(self.store.get_object(op, object_id))
+
+        self._changes = {}
+        self._rewrite = False
+        self._dirty = False
+        self._loaded_version = self.file_version()
+
+    def import_store(self, store: Store) -> None:
+        """
+        Replaces everything in the database with store using bulk inserts.
+        Expected to be called inside a transaction
+        """
+        db = self.connection
+
+        for table in ['tasks', 'checklist_items', 'lists', 'list_tasks', 'workspaces', 'workspace_lists']:
+            db.execute(f"DELETE FROM {table}")
+
+        self._write_current_workspace(store.current_workspace_id)
+
+        db.executemany(
+            "INSERT INTO tasks VALUES (?, ?, ?, ?, ?, ?)",
+            ((task.id, position, task.name, int(task.completed), task.importance, task.description)
+             for position, task in enumerate(store.tasks.values()))
+        )
+        db.executemany(
+            "INSERT INTO checklist_items VALUES (?, ?, ?, ?, ?)",
+            ((task.id, position, item.name, int(item.done), item.id)
+             for task in store.tasks.values() for position, item in enumerate(task.checklist))
+        )
+        db.executemany(
+            "INSERT INTO lists VALUES (?, ?, ?)",
+            ((ls.id, position, ls.name) for position, ls in enumerate(store.lists.values()))
+        )
+        db.executemany(
+            "INSERT INTO list_tasks VALUES (?, ?, ?)",
+            ((ls.id, position, task_id)
+             for ls in store.lists.values() for position, task_id in enumerate(ls.task_ids))
+        )
+        db.executemany(
+            "INSERT INTO workspaces VALUES (?, ?, ?)",
+            ((ws.id, position, ws.name) for position, ws in enumerate(store.workspaces.values()))
+        )
+        db.executemany(
+            "INSERT INTO workspace_lists VALUES (?, ?, ?)",
+            ((ws.id, position, list_id)
+             for ws in store.workspaces.values() for position, list_id in enumerate(ws.list_ids))
+        )
+
+    def read_state(self, store: Store) -> None:
+        # Read with the rest of the store in load_store
+        pass
+
+    def write_state(self) -> None:
+        with self.connection:
+            self._write_current_workspace(self.store.current_workspace_id)
+
+    def _write_current_workspace(self, ws_id: int) -> None:
+        self.connection.execute("INSERT OR REPLACE INTO state VALUES ('CURRENT_WORKSPACE', ?)", (str(ws_id),))
+
+    def _next_position(self, table: str) -> int:
+        """
+        The end of the table is only looked up for the first row a commit adds to it
+        """
+        if table not in self._positions:
+            row = self.connection.execute(f"SELECT MAX(position) FROM {table}").fetchone()
+            self._positions[table] = 0 if row[0] is None else row[0] + 1
+
+        position = self._positions[table]
+        self._positions[table] += 1
+
+        return position
+
+    def _upsert(self, table: str, columns: str, object_id: int, values: tuple) -> None:
+        """
+        Updates a row in place or adds it at the end if it doesn't exist yet
+        """
+        db = self.connection
+        assignments = ', '.join(f"{column} = ?" for column in columns.split(', '))
+
+        cursor = db.execute(f"UPDATE {table} SET {assignments} WHERE id = ?", values + (object_id,))
+
+        if cursor.rowcount == 0:
+            placeholders = ', '.join('?' for _ in values)
+            db.execute(f"INSERT INTO {table} (id, position, {columns}) VALUES (?, ?, {placeholders})",
+                       (object_id, self._next_position(table)) + values)
+
+    def _write_object(self, obj) -> None:
+        db = self.connection
+
+        if isinstance(obj, Task):
+            self._upsert('tasks', 'name, completed, importance, description', obj.id,
+                         (obj.name, int(obj.completed), obj.importance, obj.description))
+
+            db.execute("DELETE FROM checklist_items WHERE task_id = ?", (obj.id,))
+            db.executemany("INSERT INTO checklist_items VALUES (?, ?, ?, ?, ?)",
+                           ((obj.id, position, item.name, int(item.done), item.id) for position, item in enumerate(obj.checklist)))
+
+        elif isinstance(obj, List):
+            self._upsert('lists', 'name', obj.id, (obj.name,))
+
+            db.execute("DELETE FROM list_tasks WHERE list_id = ?", (obj.id,))
+            db.executemany("INSERT INTO list_tasks VALUES (?, ?, ?)",
+                           ((obj.id, position, task_id) for position, task_id in enumerate(obj.task_ids)))
+
+        else:
+            self._upsert('workspaces', 'name', obj.id, (obj.name,))
+
+            db.execute("DELETE FROM workspace_lists WHERE workspace_id = ?", (obj.id,))
+            db.executemany("INSERT INTO workspace_lists VALUES (?, ?, ?)",
+                           ((obj.id, position, list_id) for position, list_id in enumerate(obj.list_ids)))
+
+    def _delete_object(self, kind: str, object_id: int) -> None:
+        """
+        Memberships are left alone since the list or workspace that held
+        the object gets rewritten as well
+        """
+        db = self.connection
+
+        if kind == 'TASK':
+            db.execute("DELETE FROM tasks WHERE id = ?", (object_id,))
+            db.execute("DELETE FROM checklist_items WHERE task_id = ?", (object_id,))
+
+        elif kind == 'LIST':
+            db.execute("DELETE FROM lists WHERE id = ?", (object_id,))
+            db.execute("DELETE FROM list_tasks WHERE list_id = ?", (object_id,))
+
+        else:
+            db.execute("DELETE FROM workspaces WHERE id = ?", (object_id,))
+            db.execute("DELETE FROM workspace_lists WHERE workspace_id = ?", (object_id,))
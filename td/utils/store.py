@@ -0,0 +1,256 @@
+from td.utils.tasks import Task
+from td.utils.lists import List
+from td.utils.workspaces import Workspace
+from td.utils.idallocator import IdAllocator
+from array import array
+
+class Store:
+    """
+    An in-memory copy of td.txt.
+    The file is parsed once and every query is answered from here
+    """
+
+    def __init__(self, current_workspace_id: int = 0):
+        self.current_workspace_id = int(current_workspace_id)
+
+        # Dicts keep insertion order, which is the order objects appear in td.txt
+        self.tasks = {}
+        self.lists = {}
+        self.workspaces = {}
+
+        # id -> 'TASK', 'LIST' or 'WORKSPACE'
+        # Ids are unique across every kind of object so this finds anything in constant time
+        self.index = {}
+
+        # Reverse memberships: task id -> id of the list holding it
+        # and list id -> id of the workspace holding it
+        self.task_parents = {}
+        self.list_parents = {}
+
+        # Built from index the first time an id is needed
+        self._ids = None
+
+        # Goes up every time the store is changed.
+        # rank_maps caches RankMaps by workspace id (None for the main menu) until then
+        self.version = 0
+        self.rank_maps = {}
+
+        # Set while parsing if td.txt had blank lines in it
+        self.has_blank_lines = False
+
+    def mark_changed(self) -> None:
+        self.version += 1
+        self.rank_maps = {}
+
+    @property
+    def ids(self) -> IdAllocator:
+        if self._ids is None:
+            self._ids = IdAllocator(self.index)
+
+        return self._ids
+
+    def _claim(self, object_id: int) -> None:
+        if self._ids is not None:
+            self._ids.claim(object_id)
+
+    def _release(self, object_id: int) -> None:
+        if self._ids is not None:
+            self._ids.release(object_id)
+
+    def add_task(self, task: Task) -> None:
+        self.tasks[task.id] = task
+        self.index[task.id] = 'TASK'
+        self._claim(task.id)
+
+    def add_list(self, ls: List) -> None:
+        """
+        Also replaces a list with the same id, which happens when the journal is replayed
+        """
+        if ls.id in self.lists:
+            self._forget_tasks_of(self.lists[ls.id])
+
+        self.lists[ls.id] = ls
+        self.index[ls.id] = 'LIST'
+        self._claim(ls.id)
+
+        for task_id in ls.task_ids:
+            self.task_parents[task_id] = ls.id
+
+    def add_workspace(self, ws: Workspace) -> None:
+        if ws.id in self.workspaces:
+            self._forget_lists_of(self.workspaces[ws.id])
+
+        self.workspaces[ws.id] = ws
+        self.index[ws.id] = 'WORKSPACE'
+        self._claim(ws.id)
+
+        for list_id in ws.list_ids:
+            self.list_parents[list_id] = ws.id
+
+    def remove_task(self, task_id: int) -> Task:
+        del self.index[int(task_id)]
+        self._release(int(task_id))
+
+        return self.tasks.pop(int(task_id))
+
+    def remove_list(self, list_id: int) -> List:
+        del self.index[int(list_id)]
+        self._release(int(list_id))
+
+        ls = self.lists.pop(int(list_id))
+
+        self._forget_tasks_of(ls)
+        return ls
+
+    def remove_workspace(self, ws_id: int) -> Workspace:
+        del self.index[int(ws_id)]
+        self._release(int(ws_id))
+
+        ws = self.workspaces.pop(int(ws_id))
+
+        self._forget_lists_of(ws)
+        return ws
+
+    def _forget_tasks_of(self, ls: List) -> None:
+        for task_id in ls.task_ids:
+            if self.task_parents.get(task_id) == ls.id:
+                del self.task_parents[task_id]
+
+    def _forget_lists_of(self, ws: Workspace) -> None:
+        for list_id in ws.list_ids:
+            if self.list_parents.get(list_id) == ws.id:
+                del self.list_parents[list_id]
+
+    def add_task_to_list(self, list_id: int, task_id: int) -> List:
+        ls = self.lists[int(list_id)]
+        ls.task_ids.append(int(task_id))
+
+        self.task_parents[int(task_id)] = ls.id
+        return ls
+
+    def remove_task_from_list(self, list_id: int, task_id: int) -> List:
+        ls = self.lists[int(list_id)]
+        ls.task_ids.remove(int(task_id))
+
+        self.task_parents.pop(int(task_id), None)
+        return ls
+
+    def add_tasks_to_list(self, list_id: int, task_ids: list) -> List:
+        ls = self.lists[int(list_id)]
+        ls.task_ids.extend(array('I', task_ids))
+
+        for task_id in task_ids:
+            self.task_parents[task_id] = ls.id
+
+        return ls
+
+    def remove_tasks_from_list(self, list_id: int, task_ids: set) -> List:
+        """
+        Removes every task in task_ids from the list in one pass over it
+        """
+        ls = self.lists[int(list_id)]
+        ls.task_ids = array('I', (task_id for task_id in ls.task_ids if task_id not in task_ids))
+
+        for task_id in task_ids:
+            self.task_parents.pop(task_id, None)
+
+        return ls
+
+    def add_list_to_workspace(self, ws_id: int, list_id: int) -> Workspace:
+        ws = self.workspaces[int(ws_id)]
+        ws.list_ids.append(int(list_id))
+
+        self.list_parents[int(list_id)] = ws.id
+        return ws
+
+    def remove_lists_from_workspace(self, ws_id: int, list_ids: set) -> Workspace:
+        ws = self.workspaces[int(ws_id)]
+        ws.list_ids = array('I', (list_id for list_id in ws.list_ids if list_id not in list_ids))
+
+        for list_id in list_ids:
+            self.list_parents.pop(list_id, None)
+
+        return ws
+
+    def get_parent_list(self, task_id: int) -> List:
+        """
+        Returns the list a task is in or None
+        """
+        list_id = self.task_parents.get(int(task_id))
+
+        if list_id is None:
+            return None
+
+        return self.lists.get(list_id)
+
+    def get_parent_workspace(self, list_id: int) -> Workspace:
+        """
+        Returns the workspace a list is in or None
+        """
+        ws_id = self.list_parents.get(int(list_id))
+
+        if ws_id is None:
+            return None
+
+        return self.workspaces.get(ws_id)
+
+    def _section(self, kind: str) -> dict:
+        """
+        kind is one of 'TASK', 'LIST' or 'WORKSPACE'
+        """
+        return {'TASK': self.tasks, 'LIST': self.lists, 'WORKSPACE': self.workspaces}[kind]
+
+    def get_object(self, kind: str, object_id: int):
+        return self._section(kind).get(int(object_id))
+
+    def discard_object(self, kind: str, object_id: int) -> None:
+        """
+        Removes an object if it exists
+        """
+        if self.kind_of(object_id) != kind:
+            return
+
+        if kind == 'TASK':
+            self.remove_task(object_id)
+        elif kind == 'LIST':
+            self.remove_list(object_id)
+        else:
+            self.remove_workspace(object_id)
+
+    def kind_of(self, object_id: int) -> str:
+        """
+        Returns 'TASK', 'LIST' or 'WORKSPACE' or None if nothing has that id
+        """
+        if object_id is None:
+            return None
+
+        return self.index.get(int(object_id))
+
+    def locate(self, object_id: int) -> tuple:
+        """
+        Returns (kind, object) for an id or (None, None) if nothing has that id
+        """
+        kind = self.kind_of(object_id)
+
+        if kind is None:
+            return None, None
+
+        return kind, self._section(kind)[int(object_id)]
+
+    def get_task(self, task_id: int) -> Task:
+        return self.tasks.get(int(task_id))
+
+    def get_list(self, list_id: int) -> List:
+        return self.lists.get(int(list_id))
+
+    def get_workspace(self, ws_id: int) -> Workspace:
+        if ws_id is None:
+            return None
+
+        return self.workspaces.get(int(ws_id))
+
+    def get_all_ids(self) -> list:
+        return sorted(self.index)
+
+    def __repr__(self):
+        return f"Store({len(self.tasks)} tasks, {len(self.lists)} lists, {len(self.workspaces)} workspaces)"
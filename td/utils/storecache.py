@@ -0,0 +1,177 @@
+"""
+A binary copy of the store parsed from td.txt, kept next to it in td.txt.cache.
+Loading it skips reading and splitting every line of td.txt. It is only used while
+td.txt is unchanged, which is checked with its mtime and size and, when those
+can't be trusted, a hash of its contents
+"""
+from td.utils.tasks import Task
+from td.utils.lists import List
+from td.utils.workspaces import Workspace
+from td.utils.store import Store
+from td.utils.filemode import match_mode
+import hashlib
+import gc
+import marshal
+import tempfile
+import sys
+import time
+import os
+
+# Bump this whenever what gets written changes
+CACHE_FORMAT = 2
+
+# td.txt could have been changed again in the same tick its mtime was taken in.
+# If it was modified this close to when the cache was written its hash is checked as well
+RACY_NS = 2_000_000_000
+
+class StoreCache:
+
+    def __init__(self, PATH: str, source_path: str):
+        self.PATH = PATH
+        self.source_path = source_path
+
+    def _stat(self) -> tuple:
+        stat = os.stat(self.source_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _hash(self) -> str:
+        with open(self.source_path, 'rb') as f:
+            return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+    def _read_header(self, f) -> tuple:
+        """
+        The file starts with the length of the header, then the header and then the store.
+        marshal.load() is many times slower than marshal.loads() so both are read as bytes first
+        """
+        try:
+            length = int.from_bytes(f.read(4), 'little')
+            header = marshal.loads(f.read(length))
+        except (EOFError, ValueError, TypeError):
+            return None
+
+        if not isinstance(header, tuple) or header[:2] != (CACHE_FORMAT, tuple(sys.version_info[:2])):
+            return None
+
+        return header
+
+    def _is_fresh(self, header: tuple) -> bool:
+        _, _, mtime_ns, size, content_hash, written_ns = header
+
+        try:
+            stat = self._stat()
+        except FileNotFoundError:
+            return False
+
+        if stat == (mtime_ns, size) and mtime_ns < written_ns - RACY_NS:
+            return True
+
+        # The file was touched, or written too close to the cache to tell from the mtime
+        return self._hash() == content_hash
+
+    def is_fresh(self) -> bool:
+        try:
+            with open(self.PATH, 'rb') as f:
+                header = self._read_header(f)
+
+                return header is not None and self._is_fresh(header)
+
+        except OSError:
+            return False
+
+    def load(self) -> Store:
+        """
+        Returns the cached store or None if there is no cache or td.txt changed since it was written
+        """
+        try:
+            with open(self.PATH, 'rb') as f:
+                header = self._read_header(f)
+
+                if header is None or not self._is_fresh(header):
+                    return None
+
+                body = marshal.loads(f.read())
+
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+        # Nothing here can form a reference cycle and the collector would otherwise
+        # run over and over while hundreds of thousands of objects are created
+        gc_enabled = gc.isenabled()
+        gc.disable()
+
+        try:
+            return self._unpack(body)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def save(self, store: Store) -> None:
+        """
+        Writes store to the cache. store has to match what's in td.txt right now
+        """
+        try:
+            mtime_ns, size = self._stat()
+            header = (CACHE_FORMAT, tuple(sys.version_info[:2]), mtime_ns, size, self._hash(), time.time_ns())
+
+            directory = os.path.dirname(os.path.abspath(self.PATH))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.td-', suffix='.tmp')
+
+            try:
+                match_mode(fd, self.PATH)
+                header = marshal.dumps(header)
+
+                with os.fdopen(fd, mode='wb') as f:
+                    f.write(len(header).to_bytes(4, 'little'))
+                    f.write(header)
+                    f.write(marshal.dumps(self._pack(store)))
+
+                os.replace(tmp_path, self.PATH)
+
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+        except OSError:
+            # The cache only makes loading faster, td works without it
+            pass
+
+    def _pack(self, store: Store) -> tuple:
+        tasks = [
+            (task.id, task.name, task.completed, task.importance, task.description, task._item_names, task._item_ids, task._items_done)
+            for task in store.tasks.values()
+        ]
+        lists = [(ls.id, ls.name, ls.task_ids.tobytes()) for ls in store.lists.values()]
+        workspaces = [(ws.id, ws.name, ws.list_ids.tobytes()) for ws in store.workspaces.values()]
+
+        return (store.current_workspace_id, store.has_blank_lines, tasks, lists, workspaces)
+
+    def _unpack(self, body: tuple) -> Store:
+        current_workspace_id, has_blank_lines, tasks, lists, workspaces = body
+
+        store = Store(current_workspace_id=current_workspace_id)
+        store.has_blank_lines = has_blank_lines
+
+        for task_id, name, completed, importance, description, item_names, item_ids, items_done in tasks:
+            task = Task(name=name, task_id=task_id, importance=importance, description=description, completed=completed)
+
+            if item_names:
+                task._item_names = item_names
+                task._item_ids = item_ids
+                task._items_done = items_done
+                task._num_done = items_done.bit_count()
+
+            store.add_task(task)
+
+        for list_id, name, task_ids in lists:
+            ls = List(list_id=list_id, name=name)
+            ls.task_ids.frombytes(task_ids)
+
+            store.add_list(ls)
+
+        for ws_id, name, list_ids in workspaces:
+            ws = Workspace(name=name, workspace_id=ws_id)
+            ws.list_ids.frombytes(list_ids)
+
+            store.add_workspace(ws)
+
+        return store
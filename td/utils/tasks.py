@@ -1,38 +1,178 @@
+from bisect import bisect_left
+
+class ChecklistItem:
+    __slots__ = ('id', 'name', 'done')
+
+    def __init__(self, name: str, done: bool = False, item_id: int = None) -> None:
+        self.id = item_id
+        self.name = name
+        self.done = bool(done)
+
+    def __repr__(self):
+        return f"ChecklistItem({self.id}, {self.name}, {self.done})"
+
+class Checklist:
+    """
+    The checklist of a task.
+    The items are stored on the task as a tuple of names, a tuple of ids and an int
+    whose bits say which items are done, this only gives them a list-like interface.
+    Iterating gives ChecklistItems, changes are made through the methods.
+
+    Item ids are only unique within a task. They are given out in increasing order
+    so the ids tuple is always sorted and an item is found by bisecting it
+    """
+    __slots__ = ('task',)
+
+    def __init__(self, task: 'Task') -> None:
+        self.task = task
+
+    @property
+    def names(self) -> tuple:
+        return self.task._item_names
+
+    @property
+    def ids(self) -> tuple:
+        return self.task._item_ids
+
+    def is_done(self, index: int) -> bool:
+        return bool(self.task._items_done >> index & 1)
+
+    def index(self, name: str) -> int:
+        """
+        Returns the index of the first item called name or None
+        """
+        for index, item_name in enumerate(self.task._item_names):
+            if item_name == name:
+                return index
+
+        return None
+
+    def find(self, item_id: int) -> int:
+        """
+        Returns the index of the item with the id item_id or None
+        """
+        ids = self.task._item_ids
+        index = bisect_left(ids, item_id)
+
+        if index < len(ids) and ids[index] == item_id:
+            return index
+
+        return None
+
+    def append(self, name: str, done: bool = False, item_id: int = None) -> int:
+        """
+        Adds an item to the end and returns its id.
+        item_id is for items read back from a file, it has to be above every id the task has
+        """
+        task = self.task
+        last_id = task._item_ids[-1] if task._item_ids else 0
+
+        if item_id is None:
+            item_id = last_id + 1
+        elif item_id <= last_id:
+            raise ValueError(f"Checklist item id {item_id} isn't above {last_id}")
+
+        task._item_names += (name,)
+        task._item_ids += (item_id,)
+
+        if done:
+            self.set_done(len(task._item_names) - 1, True)
+
+        return item_id
+
+    def set_done(self, index: int, done: bool) -> None:
+        task = self.task
+
+        if self.is_done(index) == bool(done):
+            return
+
+        if done:
+            task._items_done |= 1 << index
+            task._num_done += 1
+        else:
+            task._items_done &= ~(1 << index)
+            task._num_done -= 1
+
+    def replace(self, index: int, name: str, done: bool = False) -> None:
+        """
+        Changes the name of an item, it keeps its id
+        """
+        names = self.task._item_names
+        self.task._item_names = names[:index] + (name,) + names[index+1:]
+
+        self.set_done(index, done)
+
+    def remove(self, index: int) -> None:
+        task = self.task
+        names = task._item_names
+        ids = task._item_ids
+
+        self.set_done(index, False)
+
+        task._item_names = names[:index] + names[index+1:]
+        task._item_ids = ids[:index] + ids[index+1:]
+
+        # Every bit above index moves down by one
+        below = task._items_done & ((1 << index) - 1)
+        above = task._items_done >> (index + 1) << index
+        task._items_done = below | above
+
+    def __getitem__(self, index: int) -> ChecklistItem:
+        if index < 0:
+            index += len(self)
+
+        return ChecklistItem(self.task._item_names[index], self.is_done(index), self.task._item_ids[index])
+
+    def __iter__(self):
+        task = self.task
+        done = task._items_done
+
+        for index, (item_id, name) in enumerate(zip(task._item_ids, task._item_names)):
+            yield ChecklistItem(name, done >> index & 1, item_id)
+
+    def __len__(self):
+        return len(self.task._item_names)
+
+    def __repr__(self):
+        return f"Checklist({list(self)})"
+
 class Task:
+    # Slots instead of a __dict__ since there can be hundreds of thousands of tasks.
+    # The checklist is kept here as plain values, see Checklist
+    __slots__ = ('name', 'id', 'importance', 'description', 'completed', '_item_names', '_item_ids', '_items_done', '_num_done')
 
-    def __init__(self, name: str, task_id: int, importance: int = 1, description: str = "") -> None:
+    def __init__(self, name: str, task_id: int, importance: int = 1, description: str = "", completed: bool = False) -> None:
         self.name = name
         self.id = int(task_id)
         self.importance = int(importance)
         self.description = description
-        self.checklist = []
-    
+        self.completed = bool(completed)
+
+        self._item_names = ()
+        self._item_ids = ()
+        self._items_done = 0
+
+        # Kept up to date by Checklist so the counts don't need the items
+        self._num_done = 0
+
     @property
-    def completed(self) -> bool:
-        if self.name[-1] == '0':
-            return False
-        return True
-    
+    def checklist(self) -> Checklist:
+        return Checklist(self)
+
     @property
     def num_done(self) -> int:
-        done_items = 0
-        for item in self.checklist:
-            if item[-1] == '1':
-                done_items += 1
+        return self._num_done
 
-        return done_items
-    
     @property
     def num_undone(self) -> int:
-        undone_items = 0
-        for item in self.checklist:
-            if item[-1] == '0':
-                undone_items += 1
-
-        return undone_items
-    
-    def add_item(self, item_name: str) -> None:
-        self.checklist.append(item_name)
-    
+        return len(self._item_names) - self._num_done
+
+    @property
+    def num_items(self) -> int:
+        return len(self._item_names)
+
+    def add_item(self, item_name: str, done: bool = False, item_id: int = None) -> int:
+        return self.checklist.append(item_name, done, item_id)
+
     def __repr__(self):
         return f"Task({self.id}, {self.name})"
@@ -1,10 +1,13 @@
+from array import array
+
 class Workspace:
+    __slots__ = ('name', 'id', 'list_ids')
 
     def __init__(self, name, workspace_id):
         
         self.name = name
         self.id = int(workspace_id)
-        self.list_ids = []
+        self.list_ids = array('I')
 
     def __repr__(self):
-        return f"Workspace({self.id}, {self.name})"
\ No newline at end of file
+        return f"Workspace({self.id}, {self.name})"
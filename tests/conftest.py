@@ -0,0 +1,67 @@
+"""
+The tests run td the way it's run from a shell: as its own process, in a temporary
+directory that is also HOME, so td.txt and everything next to it start out empty
+"""
+import subprocess
+import sys
+import os
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Set by the tests that need them, never taken from the shell running pytest
+TD_ENV = ['TD_JOURNAL', 'TD_BACKEND', 'TD_QUIET', 'TD_SOCKET']
+
+class TD:
+
+    def __init__(self, path: str, env: dict) -> None:
+        self.path = path
+        self.env = env
+
+    def run(self, *args, input: str = None) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [sys.executable, '-m', 'td.td', *args],
+            cwd=self.path, env=self.env, input=input, capture_output=True, text=True
+        )
+
+    def __call__(self, *args, input: str = None) -> str:
+        """
+        Runs a command that has to work and returns what it printed
+        """
+        result = self.run(*args, input=input)
+        assert result.returncode == 0, result.stdout + result.stderr
+
+        return result.stdout
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def read(self, name: str = 'td.txt') -> str:
+        with open(self.file(name), newline='') as f:
+            return f.read()
+
+    def write(self, name: str, text: str) -> str:
+        with open(self.file(name), 'w', newline='') as f:
+            f.write(text)
+
+        return self.file(name)
+
+@pytest.fixture
+def td(tmp_path) -> TD:
+    """
+    td in an empty directory, quiet so that commands print one line per change
+    """
+    env = {name: value for name, value in os.environ.items() if name not in TD_ENV}
+    env.update(HOME=str(tmp_path), PYTHONPATH=ROOT, TD_QUIET='1', COLUMNS='100', TERM='dumb')
+
+    return TD(str(tmp_path), env)
+
+@pytest.fixture
+def ws(td) -> TD:
+    """
+    td inside the workspace td.txt is created with
+    """
+    td('show')
+    td('move', '1')
+
+    return td
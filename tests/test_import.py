@@ -0,0 +1,65 @@
+import json
+import pytest
+
+LINE_BREAKS = ['\r', '\n', '\r\n', '\x0b', '\x0c', '\x1c', '\x1d', '\x1e', '\x85', ' ', ' ']
+
+def ndjson(*records) -> str:
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+def test_import_adds_tasks(ws):
+    path = ws.write('tasks.ndjson', ndjson(
+        {'name': 'a', 'checklist': ['x', 'y']},
+        {'name': 'b', 'list': 'L', 'status': 'done'},
+    ))
+
+    assert 'Imported 2 tasks, added 1 lists' in ws('import', path)
+
+    tasks = {task['name']: task for task in json.loads(ws('show', '--json', '-a')) if task.get('type') == 'task'}
+
+    assert [item['name'] for item in tasks['a']['checklist']] == ['x', 'y']
+    assert tasks['b']['status'] == 'done'
+
+@pytest.mark.parametrize('field, line_break', [
+    *((field, '\r') for field in ['name', 'list', 'workspace', 'description', 'checklist']),
+    *(('name', line_break) for line_break in LINE_BREAKS),
+])
+def test_import_rejects_line_breaks(ws, field, line_break):
+    record = {'name': 'a'}
+    text = f"x{line_break}y"
+    record[field] = [text] if field == 'checklist' else text
+
+    before = ws.read()
+    path = ws.write('tasks.ndjson', ndjson({'name': 'fine'}, record))
+
+    result = ws.run('import', path)
+
+    assert result.returncode != 0
+    assert 'Line 2' in result.stdout + result.stderr
+
+    # Nothing from the file is added, not even the good record before it
+    assert ws.read() == before
+    assert '\r' not in ws.read()
+
+def test_import_rejects_the_separator(ws):
+    separator = ",._=+*&(,../){./;'"
+    path = ws.write('tasks.csv', f'name,description\na,"b{separator}c"\n')
+
+    result = ws.run('import', path)
+
+    assert result.returncode != 0
+    assert 'Line 2' in result.stdout + result.stderr
+
+def test_import_reads_crlf_ndjson(ws):
+    path = ws.write('tasks.ndjson', '{"name": "a", "description": "d"}\r\n{"name": "b"}\r\n')
+
+    assert 'Imported 2 tasks' in ws('import', path)
+    assert '\r' not in ws.read()
+
+def test_import_rejects_a_raw_carriage_return(ws):
+    before = ws.read()
+    path = ws.write('tasks.ndjson', '{"name": "ok"}\n{"name": "a\rb"}\n')
+
+    result = ws.run('import', path)
+
+    assert result.returncode != 0
+    assert ws.read() == before
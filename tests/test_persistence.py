@@ -0,0 +1,208 @@
+import json
+import os
+import pytest
+
+SEPARATOR = ",._=+*&(,../){./;'"
+
+BACKENDS = {
+    'text': {},
+    'journal': {'TD_JOURNAL': '1'},
+    'sqlite': {'TD_BACKEND': 'sqlite'},
+}
+
+@pytest.fixture(params=list(BACKENDS))
+def backend(request, td):
+    """
+    td in its workspace with every backend
+    """
+    td.env.update(BACKENDS[request.param])
+
+    td('show')
+    td('move', '1')
+
+    return td
+
+def snapshot(td) -> dict:
+    """
+    The contents of every file td keeps its data in
+    """
+    files = {}
+
+    for name in os.listdir(td.path):
+        if name.startswith('td.'):
+            with open(td.file(name), 'rb') as f:
+                files[name] = f.read()
+
+    return files
+
+def added_rank(output: str) -> str:
+    """
+    The rank printed by td add in quiet mode
+    """
+    return output.rsplit('rank=', 1)[1].split()[0]
+
+def shown(td) -> list:
+    return json.loads(td('show', '--json', '-a'))
+
+def checklist_ids(td, rank: str) -> list:
+    task = json.loads(td('show', '--json', '-i', rank))[0]
+    return sorted((item['id'], item['name']) for item in task['checklist'])
+
+@pytest.mark.parametrize('args', [
+    ['add', 'task', 'x', '-i', '99'],
+    ['add', 'cs', 'x', '-i', '99'],
+    ['done', '3', '99'],
+    ['del', '3', '99'],
+])
+def test_failed_command_changes_nothing(backend, args):
+    backend('add', 'task', 'a')
+    backend('add', 'task', 'b')
+
+    before = snapshot(backend)
+    result = backend.run(*args)
+
+    assert result.returncode != 0
+    assert snapshot(backend) == before
+
+def test_journal_is_replayed_and_compacted(ws):
+    ws('add', 'task', 'a')
+    td_txt = ws.read()
+
+    ws.env['TD_JOURNAL'] = '1'
+    ws('add', 'task', 'b')
+    ws('done', '3')
+    ws('add', 'cs', 'item', '-i', '4')
+
+    # Every change so far is only in the journal
+    assert ws.read() == td_txt
+    assert os.path.exists(ws.file('td.txt.journal'))
+
+    # Replayed on top of the cache and on top of td.txt
+    journaled = shown(ws)
+    os.remove(ws.file('td.txt.cache'))
+    assert shown(ws) == journaled
+
+    tasks = {task['name']: task for task in journaled if task['type'] == 'task'}
+
+    assert sorted(tasks) == ['a', 'b']
+    assert tasks['a']['status'] == 'done'
+
+    # A command without the journal writes everything to td.txt and removes it
+    del ws.env['TD_JOURNAL']
+    ws('add', 'task', 'c')
+
+    assert not os.path.exists(ws.file('td.txt.journal'))
+
+    os.remove(ws.file('td.txt.cache'))
+    compacted = shown(ws)
+
+    tasks = {task['name']: task for task in compacted if task['type'] == 'task'}
+
+    assert sorted(tasks) == ['a', 'b', 'c']
+    assert tasks['a']['status'] == 'done'
+    assert [item['name'] for item in tasks['b']['checklist']] == ['item']
+
+def test_current_workspace_is_kept_in_the_state_file(td):
+    td('show')
+    td_txt = td.read()
+
+    td('move', '1')
+
+    # Moving only writes td.txt.state
+    assert td.read() == td_txt
+    assert td.read('td.txt.state') == 'CURRENT_WORKSPACE=1\n'
+    assert 'added task' in td('add', 'task', 'a')
+
+    td('exit')
+    assert td.read('td.txt.state') == 'CURRENT_WORKSPACE=0\n'
+
+    # Without the state file td.txt says where td is, like before it existed
+    lines = td.read().split('\n')
+    lines[0] = 'CURRENT_WORKSPACE=1'
+    td.write('td.txt', '\n'.join(lines))
+    os.remove(td.file('td.txt.state'))
+
+    assert 'added task' in td('add', 'task', 'b')
+
+def test_state_file_left_by_another_td_txt_is_ignored(ws):
+    ws.write('td.txt.state', 'CURRENT_WORKSPACE=12345\n')
+
+    result = ws.run('add', 'task', 'a')
+
+    assert result.returncode != 0
+    assert 'main menu' in result.stdout + result.stderr
+
+def test_checklist_item_ids_are_kept(backend):
+    backend('add', 'task', 't')
+
+    for name in ['a', 'b', 'c']:
+        backend('add', 'cs', name, '-i', '3')
+
+    backend('del', '3', '-r', '1')
+    backend('add', 'cs', 'd', '-i', '3')
+
+    expected = [(2, 'b'), (3, 'c'), (4, 'd')]
+    assert checklist_ids(backend, '3') == expected
+
+    # Read back from td.txt or td.db instead of the cache
+    if os.path.exists(backend.file('td.txt.cache')):
+        os.remove(backend.file('td.txt.cache'))
+
+    assert checklist_ids(backend, '3') == expected
+
+    # New items get ids after the ones that were saved
+    assert 'item=5' in backend('add', 'cs', 'e', '-i', '3')
+
+def test_checklist_item_ids_in_td_txt(ws):
+    ws('add', 'task', 't')
+
+    for name in ['a', 'b', 'c']:
+        ws('add', 'cs', name, '-i', '3')
+
+    # Numbered 1 to n, written just like before item ids were saved
+    assert f"a0{SEPARATOR}b0{SEPARATOR}c0{SEPARATOR}\n" in ws.read()
+
+    ws('del', '3', '-r', '1')
+    assert f"b0{SEPARATOR}c0{SEPARATOR}{SEPARATOR}2,3{SEPARATOR}\n" in ws.read()
+
+@pytest.mark.parametrize('ids_field', ['', '1', '3,2', 'x,y', '0,1'])
+def test_checklist_items_without_valid_ids_are_numbered(ws, ids_field):
+    ws('add', 'task', 't')
+    ws('add', 'cs', 'a', '-i', '3')
+    ws('add', 'cs', 'b', '-i', '3')
+
+    # An ids field that doesn't fit the items is ignored
+    td_txt = ws.read().replace(f"b0{SEPARATOR}\n", f"b0{SEPARATOR}{SEPARATOR}{ids_field}{SEPARATOR}\n")
+    ws.write('td.txt', td_txt)
+    os.remove(ws.file('td.txt.cache'))
+
+    result = ws.run('show', '--json', '-i', '3')
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    items = [(item['id'], item['name']) for item in json.loads(result.stdout)[0]['checklist']]
+    assert items[:2] == [(1, 'a'), (2, 'b')]
+
+def test_cache_gives_the_same_store_as_td_txt(ws):
+    ws('add', 'task', 'a', '-d', 'desc', '-im', '3')
+    ws('add', 'list', 'L')
+    ws('add', 'task', 'b', '-i', added_rank(ws('add', 'list', 'M')))
+
+    task_rank = added_rank(ws('add', 'task', 'c'))
+    ws('add', 'cs', 'x', '-i', task_rank)
+    ws('add', 'cs', 'y', '-i', task_rank)
+    ws('done', task_rank, '-r', '1')
+    ws('add', 'ws', 'W')
+
+    assert os.path.exists(ws.file('td.txt.cache'))
+    cached = shown(ws)
+
+    os.remove(ws.file('td.txt.cache'))
+    assert shown(ws) == cached
+
+def test_cache_isnt_used_after_td_txt_changes(ws):
+    ws('add', 'task', 'a')
+    shown(ws)
+
+    ws.write('td.txt', ws.read().replace(f"a0{SEPARATOR}", f"z0{SEPARATOR}"))
+
+    assert [task['name'] for task in shown(ws) if task['type'] == 'task'] == ['z']